@@ -0,0 +1,127 @@
+# Checks that replaying an input recording doesnt depend on the baked rooms in cache/rooms
+#
+# Replays the recording twice in headless mode, first with no baked rooms (every room gets drawn and baked) and then with the rooms the first replay baked,
+# and compares how the two replays ended (the screen, the state of the random module, the scene, the room, the player and the score)
+# Both replays start from a copy of the saves and use their own bake folder, so cache/rooms and saves.db stay untouched
+#
+# Usage (from anywhere):
+#   python bench/replaycheck.py session.lpin    - exits with 1 if the two replays ended differently
+
+import os
+import sys
+import json
+import random
+import shutil
+import hashlib
+import argparse
+import runpy
+import subprocess
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def endState():
+    # How the game ended, compared between the two replays
+    import pygame
+    import globals as glb
+
+    state = {
+        "screen": hashlib.md5(pygame.image.tobytes(glb.screen, "RGB")).hexdigest(),
+        "random": hashlib.md5(repr(random.getstate()).encode()).hexdigest(),
+        "scene": type(glb.scene_manager.current_scene).__name__
+    }
+
+    # Only there once the game has been started
+    if hasattr(glb.engine, "rm"):
+        state["room"] = glb.engine.rm.current_room_name
+        state["player"] = [glb.engine.player.x, glb.engine.player.y, glb.engine.player.health]
+        state["score"] = glb.engine.score
+
+    return state
+
+def replay(recording_path, baked_maps_path):
+    # Runs in its own process (the game can only be started once per process), prints how the replay ended as JSON on the last line
+    sys.path.insert(0, ROOT)
+    os.chdir(ROOT)
+
+    os.environ["LASERPUNK_HEADLESS"] = "1"
+    os.environ["LASERPUNK_REPLAY"] = recording_path
+
+    import globals as glb
+    import engine
+
+    engine.LevelRoom.baked_maps_path = baked_maps_path
+
+    # Count how the level rooms got their maps, so it shows that the two replays really built them differently
+    rooms = {"rooms_drawn": 0, "rooms_loaded": 0}
+    draw_map, read_baked_map = engine.LevelRoom.drawMap, engine.LevelRoom.readBakedMap
+
+    def drawMap(*args):
+        rooms["rooms_drawn"] += 1
+        return draw_map(*args)
+
+    def readBakedMap(bake_key):
+        baked = read_baked_map(bake_key)
+        if baked is not None: rooms["rooms_loaded"] += 1
+        return baked
+
+    engine.LevelRoom.drawMap, engine.LevelRoom.readBakedMap = drawMap, readBakedMap
+
+    # main.py stops the input stream right before it closes, while the last frame is still on the screen
+    ending = {}
+    stop = glb.input_stream.stop
+
+    def stopAndRecordEnding():
+        ending.update(endState())
+        stop()
+
+    glb.input_stream.stop = stopAndRecordEnding
+
+    try:                runpy.run_path("main.py", run_name="__main__")
+    except SystemExit:  pass
+
+    ending.update(rooms)
+    print(json.dumps(ending))
+
+def main():
+    parser = argparse.ArgumentParser(description="Checks that replaying an input recording doesnt depend on the baked rooms")
+    parser.add_argument("recording", help="Input recording made with --record")
+    parser.add_argument("--baked-maps", help=argparse.SUPPRESS) # Only given to the replays themselves
+    args = parser.parse_args()
+
+    recording_path = os.path.abspath(args.recording)
+
+    if args.baked_maps is not None: return replay(recording_path, args.baked_maps)
+
+    endings = []
+
+    with tempfile.TemporaryDirectory() as temp_path:
+        baked_maps_path = os.path.join(temp_path, "rooms")
+        saves_path = os.path.join(temp_path, "saves.db")
+
+        for cache in ("cold", "warm"):
+            # Both replays start from the saves as they are now (the first one would change them otherwise)
+            if os.path.exists(os.path.join(ROOT, "saves.db")): shutil.copyfile(os.path.join(ROOT, "saves.db"), saves_path)
+            elif os.path.exists(saves_path):                   os.remove(saves_path)
+
+            result = subprocess.run([sys.executable, os.path.abspath(__file__), recording_path, "--baked-maps", baked_maps_path], capture_output=True, text=True, env=dict(os.environ, LASERPUNK_SAVES=saves_path))
+
+            if result.returncode != 0:
+                print(result.stderr, file=sys.stderr)
+                sys.exit(result.returncode)
+
+            ending = json.loads(result.stdout.strip().splitlines()[-1])
+            endings.append(ending)
+
+            print(f"{cache} cache: {ending['rooms_drawn']} rooms drawn, {ending['rooms_loaded']} loaded from bakes, ended in {ending['scene']}{' (' + ending['room'] + ')' if 'room' in ending else ''}")
+
+    differences = [key for key in endings[0] if not key.startswith("rooms_") and endings[0][key] != endings[1].get(key)]
+
+    if differences:
+        print(f"The replays ended differently: {', '.join(differences)}")
+        sys.exit(1)
+
+    print("Both replays ended the same")
+
+if __name__ == "__main__":
+    main()
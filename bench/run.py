@@ -0,0 +1,521 @@
+# Frame time benchmarks over scripted scenes
+#
+# Boots the game headless, puts every scene in the game on screen and drives it with scripted input (walking, sprinting in to walls,
+# rotating redirectors, opening lockers, fighting automatons), then reports the p50/p95/p99 time per frame split in to input/update/draw,
+# the time spent in the functions that usually regress, the most memory a frame needs at once (peak KiB of Python objects) and how many blocks a frame allocates
+#
+# Usage (from anywhere):
+#   python bench/run.py                                 - runs every scenario, writes bench/results.json
+#   python bench/run.py --output before.json room_1     - runs only the given scenarios
+#   python bench/run.py --compare before.json           - also prints how much every p95 time, peak memory and allocation count changed since before.json (exits with 1 on a regression)
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import itertools
+import platform
+import subprocess
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# The game loads everything relative to its own folder
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+os.environ["LASERPUNK_HEADLESS"] = "1"
+
+import pygame
+pygame.init()
+
+import globals as glb
+import settings
+import engine
+import scene
+import data
+
+settings.preload_rooms = False # The preloading thread would make the frame times depend on when it finishes
+
+scene.NamePrompt() # Fills in glb.names, which some constructors check
+
+WARMUP_FRAMES = 30 # Not counted, the first frames fill up the caches
+ALLOCATION_SAMPLE_FRAMES = 10 # Allocations are only counted on every 10th frame, comparing the tracemalloc snapshots takes a lot longer than the frame itself
+TIMED_FUNCTIONS = [(engine.CollidableEntity, "collideCheck"), (engine.LevelRoom, "drawLaserPath"), (engine.LevelRoom, "updateLaserPath"), (engine.GameEngine, "draw"), (engine.RoomManager, "updatePreloading")]
+
+# Input
+
+class HeldKeys:
+    # Stands in for pygame.key.get_pressed(), indexed with key codes
+    def __init__(self, keys):
+        self.keys = keys
+
+    def __getitem__(self, key_code):
+        return key_code in self.keys
+
+class Frame:
+    # The input of one scripted frame
+    def __init__(self, keys=(), mouse_pos=(0, 0), left=False, right=False, wheel=0):
+        self.keys = set(keys)
+        self.mouse_pos = mouse_pos
+        self.buttons = (left, False, right)
+        self.wheel = wheel
+
+def feedInput(frame):
+    input_stream = glb.input_stream
+
+    input_stream.general_events = [pygame.event.Event(pygame.MOUSEWHEEL, x=0, y=frame.wheel)] if frame.wheel else []
+    input_stream.keyboard.setState(HeldKeys(frame.keys), [])
+    input_stream.mouse.setState(frame.buttons, frame.mouse_pos)
+
+# Scripting helpers
+
+def hold(keys, frames, **kwargs):
+    for _ in range(frames): yield Frame(keys, **kwargs)
+
+def wait(frames):
+    yield from hold((), frames)
+
+def walk(directions, frames):
+    # directions: 0 = up, 1 = left, 2 = down, 3 = right (same order as settings.movement)
+    yield from hold([settings.movement[direction] for direction in directions], frames)
+
+def sprintInToWalls():
+    # Turn sprinting on and run in to every wall
+    for direction in range(4):
+        yield Frame([settings.sprint_key])
+        yield from wait(1)
+        yield from walk([direction], 150)
+
+def teleportNextTo(rect):
+    # Puts the player right below the rect (close enough to interact with it) and moves the camera there
+    player = glb.engine.player
+
+    player.changeXY(rect.centerx - player.rect.width // 2, rect.bottom + 4)
+    glb.engine.camera.update(player, False)
+
+def clickOn(object, right=False):
+    # Clicks on a pixel of the object's mask (the click has to hit the mask, not just the rect)
+    outline = object.mask.outline()
+    x, y = outline[len(outline) // 2] if outline else (object.rect.width // 2, object.rect.height // 2)
+
+    mouse_pos = glb.engine.camera.apply(object.rect).move(x, y).topleft
+
+    yield Frame(mouse_pos=mouse_pos)
+    yield Frame(mouse_pos=mouse_pos, left=not right, right=right)
+    yield Frame(mouse_pos=mouse_pos)
+
+def keepPlayerAlive():
+    # The scripts walk through lasers and automatons, the benchmark shouldnt end on the death screen
+    glb.engine.player.health = 100
+
+# Scene setup
+
+def startGame():
+    random.seed(0)
+
+    data.DBData.player_name = "BENCH"
+
+    glb.engine.gameStart()
+    glb.engine.cinematic_camera = False
+
+    glb.scene_manager.current_scene = glb.engine
+    glb.scene_manager.transition.active = False
+
+def enterRoom(room_name, entering_from):
+    room_manager = glb.engine.rm
+
+    if room_name not in room_manager.active_rooms: room_manager.createRoom(room_name)
+
+    room_manager.current_room_name = room_name
+    room_manager.current_room_map = room_manager.active_rooms[room_name]
+    room_manager.current_room_map.onEnter(entering_from)
+
+    # Same as the room transition, so the room can get evicted (with a snapshot) later
+    if room_name in room_manager.visited_rooms: room_manager.visited_rooms.remove(room_name)
+    room_manager.visited_rooms.append(room_name)
+
+    glb.engine.player.setLimits(room_manager.current_room_map.map_rect, room_manager.current_room_map.map_borders)
+    glb.engine.invalidate()
+
+# Scenarios (each one sets its scene up and yields the frames of input)
+
+def mainMenu():
+    random.seed(0)
+
+    glb.scene_manager.current_scene = glb.main_menu
+    glb.scene_manager.transition.active = False
+
+    # Sweep the mouse over the buttons
+    for i in range(600):
+        yield Frame(mouse_pos=(200 + (i * 9) % 880, 250 + (i * 5) % 300))
+
+def saveSelect():
+    random.seed(0)
+
+    glb.scene_manager.current_scene = scene.SaveSelect()
+    glb.scene_manager.transition.active = False
+
+    # Sweep over the list and scroll it
+    for i in range(600):
+        yield Frame(mouse_pos=(300 + (i * 7) % 600, 150 + (i * 3) % 450), wheel=(-1 if i % 40 < 20 else 1) if i % 10 == 0 else 0)
+
+def firstFloor():
+    startGame()
+
+    # Walk across the room and back
+    yield from walk([3], 200)
+    yield from walk([1], 200)
+    yield from walk([0, 3], 100)
+    yield from walk([2, 1], 100)
+
+    yield from sprintInToWalls()
+
+    # Fight the automatons
+    glb.engine.player.inventory.aquireNewWeapon("weapon")
+
+    for automaton in list(glb.engine.rm.current_room_map.entities):
+        for _ in range(8):
+            if not automaton.alive(): break
+
+            teleportNextTo(automaton.rect)
+
+            yield from clickOn(automaton)
+            yield from wait(40) # The weapon cooldown
+
+def resourceRoom():
+    startGame()
+    enterRoom("resource_room", "first_floor")
+
+    yield from walk([3], 150)
+    yield from walk([0], 150)
+    yield from walk([1], 150)
+    yield from walk([2], 150)
+
+    yield from sprintInToWalls()
+
+def levelRoom(room_name, entering_from):
+    startGame()
+    enterRoom(room_name, entering_from)
+
+    room = glb.engine.rm.current_room_map
+
+    yield from walk([0], 150)
+    yield from walk([3], 150)
+    yield from walk([2], 150)
+    yield from walk([1], 150)
+
+    yield from sprintInToWalls()
+
+    # Rotate every redirector all the way around
+    for redirector in [object for object in room.objects if type(object) == engine.Redirector]:
+        teleportNextTo(redirector.rect)
+
+        for _ in range(4): yield from clickOn(redirector)
+
+    # Open every locker and walk away from it (which closes it)
+    for locker in [object for object in room.objects if type(object) == engine.Locker]:
+        locker.unlocked = True # The reward locker would need the key
+
+        teleportNextTo(locker.rect)
+
+        yield from clickOn(locker)
+        yield from wait(60)
+        yield from walk([2], 40)
+
+def preloading():
+    # Walks around the first floor while room_1 gets preloaded, the frames that build it shouldnt be much longer than the rest
+    engine.Room1Map() # Bakes room_1 if it isnt yet, the preloading thread only reads baked maps
+
+    startGame()
+
+    yield from walk([3], WARMUP_FRAMES)
+
+    settings.preload_rooms = True
+    glb.engine.rm.preloadAdjacentRooms()
+    settings.preload_rooms = False
+
+    # Wait for the baked map to be read, so the build steps always start on the same frame
+    for future in glb.engine.rm.preloading.values(): future.result()
+
+    yield from walk([1], 200)
+    yield from walk([0, 3], 100)
+    yield from walk([2, 1], 100)
+
+def roomEviction():
+    # Goes back and forth between room_1 and room_1_5 with only one live level room, so every trip evicts the room that was left (snapshotState())
+    # and creates the other one again from its snapshot (restoreState()), the restored room has to come back the way it was left
+    max_live_rooms = settings.max_live_rooms
+    settings.max_live_rooms = 1
+
+    try:
+        startGame()
+        enterRoom("room_1", "first_floor")
+
+        for trip in range(4):
+            room_manager = glb.engine.rm
+            room = room_manager.current_room_map
+
+            # Change the room a bit, so there is something to restore
+            for redirector in [object for object in room.objects if type(object) == engine.Redirector][trip::3]:
+                teleportNextTo(redirector.rect)
+
+                yield from clickOn(redirector)
+
+            left_state = {key: value for key, value in room.snapshotState().items() if key != "automatons"} # The automatons keep moving after the room gets created again
+            left_room_name = room_manager.current_room_name
+            next_room_name = "room_1_5" if left_room_name == "room_1" else "room_1"
+
+            room_manager.moveTo(next_room_name)
+            yield from wait(1)
+
+            while room_manager.room_transition.active: yield from wait(1)
+
+            if left_room_name in room_manager.active_rooms: raise RuntimeError(f"{left_room_name} didnt get evicted")
+
+            # Go back and check the room the same way
+            room_manager.moveTo(left_room_name)
+            yield from wait(1)
+
+            while room_manager.room_transition.active: yield from wait(1)
+
+            restored_state = {key: value for key, value in room_manager.current_room_map.snapshotState().items() if key != "automatons"}
+            if restored_state != left_state: raise RuntimeError(f"{left_room_name} didnt come back the way it was left")
+
+            yield from walk([trip % 4], 60)
+
+    finally:
+        settings.max_live_rooms = max_live_rooms
+
+SCENARIOS = {
+    "main_menu":     mainMenu,
+    "save_select":   saveSelect,
+    "first_floor":   firstFloor,
+    "resource_room": resourceRoom,
+    "room_1":        lambda: levelRoom("room_1", "first_floor"),
+    "room_1_5":      lambda: levelRoom("room_1_5", "room_1"),
+    "preloading":    preloading,
+    "room_eviction": roomEviction
+}
+
+# Measuring
+
+def timeFunctions(totals):
+    # Wraps the functions in TIMED_FUNCTIONS so every call adds its time to totals
+    for owner, name in TIMED_FUNCTIONS:
+        original = owner.__dict__[name]
+        key = f"{owner.__name__}.{name}"
+
+        def timed(*args, original=original, key=key, **kwargs):
+            start = time.perf_counter()
+
+            try:     return original(*args, **kwargs)
+            finally: totals[key] += time.perf_counter() - start
+
+        setattr(owner, name, timed)
+
+def runFrame(frame):
+    # Runs one frame like main.py does (one step, then a draw), returns the time of every part in seconds
+    scene_manager = glb.scene_manager
+
+    feedInput(frame)
+
+    start = time.perf_counter()
+    scene_manager.input()
+    input_end = time.perf_counter()
+    scene_manager.update()
+    glb.sound_engine.update()
+    update_end = time.perf_counter()
+    scene_manager.draw()
+    draw_end = time.perf_counter()
+
+    if scene_manager.current_scene is glb.engine: keepPlayerAlive()
+
+    return input_end - start, update_end - input_end, draw_end - update_end
+
+def percentiles(values):
+    # Times in milliseconds
+    if not values: return {"p50": 0, "p95": 0, "p99": 0, "mean": 0, "max": 0, "sum": 0}
+
+    ordered = sorted(values)
+
+    def at(fraction): return round(ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] * 1000, 4)
+
+    return {"p50": at(0.5), "p95": at(0.95), "p99": at(0.99), "mean": round(sum(ordered) / len(ordered) * 1000, 4), "max": round(ordered[-1] * 1000, 4), "sum": round(sum(ordered) * 1000, 4)} # sum is for functions that only run on a few frames
+
+def timeScenario(scenario, totals):
+    phases = {"input": [], "update": [], "draw": [], "total": []}
+    functions = {key: [] for key in totals}
+
+    # Setting the scene up (starting the game, creating the room) happens when the first frame is asked for
+    for key in totals: totals[key] = 0
+
+    frames = scenario()
+    start = time.perf_counter()
+    first_frame = next(frames)
+
+    setup = {"ms": round((time.perf_counter() - start) * 1000, 4), "functions": {key: round(total * 1000, 4) for key, total in totals.items() if total}}
+
+    for index, frame in enumerate(itertools.chain([first_frame], frames)):
+        for key in totals: totals[key] = 0
+
+        input_time, update_time, draw_time = runFrame(frame)
+
+        if index < WARMUP_FRAMES: continue
+
+        phases["input"].append(input_time)
+        phases["update"].append(update_time)
+        phases["draw"].append(draw_time)
+        phases["total"].append(input_time + update_time + draw_time)
+
+        for key, total in totals.items(): functions[key].append(total)
+
+    result = {"frames": len(phases["total"]), "setup": setup}
+    result.update({phase: percentiles(times) for phase, times in phases.items()})
+    result["functions"] = {key: percentiles(times) for key, times in functions.items() if any(times)}
+
+    return result
+
+def countAllocations(start_snapshot, end_snapshot):
+    # Blocks (and their KiB) that the lines of code allocated between the two snapshots, added up over every line that has more blocks alive than before
+    allocated_blocks = allocated_bytes = 0
+
+    for stat in end_snapshot.compare_to(start_snapshot, "lineno"):
+        if stat.count_diff <= 0 or stat.traceback[0].filename == tracemalloc.__file__: continue # The start snapshot itself gets allocated in between too
+
+        allocated_blocks += stat.count_diff
+        allocated_bytes += max(stat.size_diff, 0)
+
+    return allocated_blocks, allocated_bytes
+
+def measureMemory(scenario):
+    # Runs the scenario again with tracemalloc on (a separate run, because tracing slows everything down)
+    # Measures how far above its starting point the traced memory went during every frame, how many blocks were still alive after it,
+    # and on every ALLOCATION_SAMPLE_FRAMES-th frame how many blocks the frame allocated (by comparing snapshots from before and after it)
+    # NOTE: Only Python allocations are seen, the pixel memory of pygame surfaces is allocated by SDL
+    # NOTE: A block that gets allocated and freed again during the frame isnt counted as an allocation, those only show up in the peak
+    peak_bytes = []
+    retained_blocks = []
+    allocated_blocks = []
+    allocated_bytes = []
+
+    tracemalloc.start()
+
+    for index, frame in enumerate(scenario()):
+        sampled = index >= WARMUP_FRAMES and index % ALLOCATION_SAMPLE_FRAMES == 0
+        if sampled: start_snapshot = tracemalloc.take_snapshot()
+
+        tracemalloc.reset_peak()
+        start_bytes = tracemalloc.get_traced_memory()[0]
+        start_blocks = sys.getallocatedblocks()
+
+        runFrame(frame)
+
+        if index < WARMUP_FRAMES: continue
+
+        peak_bytes.append(tracemalloc.get_traced_memory()[1] - start_bytes) # How much memory the frame needed at most
+        retained_blocks.append(sys.getallocatedblocks() - start_blocks) # Blocks still alive after the frame (grows if something leaks)
+
+        if sampled:
+            blocks, size = countAllocations(start_snapshot, tracemalloc.take_snapshot())
+
+            allocated_blocks.append(blocks)
+            allocated_bytes.append(size)
+
+    tracemalloc.stop()
+
+    peak_bytes.sort()
+
+    return {
+        "peak_kib_p50": round(peak_bytes[len(peak_bytes) // 2] / 1024, 2) if peak_bytes else 0,
+        "peak_kib_p95": round(peak_bytes[int(len(peak_bytes) * 0.95)] / 1024, 2) if peak_bytes else 0,
+        "retained_blocks_per_frame": round(sum(retained_blocks) / len(retained_blocks), 2) if retained_blocks else 0,
+        "allocations_per_frame_mean": round(sum(allocated_blocks) / len(allocated_blocks), 2) if allocated_blocks else 0,
+        "allocations_per_frame_max": max(allocated_blocks, default=0),
+        "allocated_kib_per_frame_mean": round(sum(allocated_bytes) / len(allocated_bytes) / 1024, 2) if allocated_bytes else 0,
+        "sampled_frames": len(allocated_blocks)
+    }
+
+def gitCommit():
+    try:    return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError): return None
+
+def compare(previous, current, threshold):
+    # Prints the change of every p95 time, the peak memory and the allocations, returns True if any of them got bigger by more than threshold percent
+    regressed = False
+
+    for name, result in current["scenarios"].items():
+        if name not in previous["scenarios"]: continue
+
+        previous_result = previous["scenarios"][name]
+        # (label, before, after, unit, smallest change that counts (smaller ones are mostly noise), what a regression is called)
+        rows = [(phase, previous_result[phase]["p95"], result[phase]["p95"], "ms", 0.05, "slower") for phase in ("input", "update", "draw", "total")]
+        rows += [(key, previous_result["functions"][key]["p95"], times["p95"], "ms", 0.05, "slower") for key, times in result["functions"].items() if key in previous_result["functions"]]
+
+        if "memory" in result and "memory" in previous_result:
+            rows.append(("peak memory", previous_result["memory"]["peak_kib_p95"], result["memory"]["peak_kib_p95"], "KiB", 1, "more memory"))
+            rows.append(("allocations per frame", previous_result["memory"]["allocations_per_frame_mean"], result["memory"]["allocations_per_frame_mean"], "", 2, "more allocations"))
+
+        print(name)
+
+        for label, before, after, unit, noise, regression in rows:
+            change = (after - before) / before * 100 if before else 0
+            flag = ""
+
+            if change > threshold and after - before > noise:
+                flag = f"  <- {regression}"
+                regressed = True
+
+            print(f"  {label:<30} {before:>9.3f} {unit:<3} -> {after:>9.3f} {unit:<3}  {change:+7.1f}%{flag}")
+
+    return regressed
+
+def main():
+    parser = argparse.ArgumentParser(description="Frame time benchmarks over scripted scenes")
+    parser.add_argument("scenarios", nargs="*", help=f"Scenarios to run, all of them by default ({', '.join(SCENARIOS)})")
+    parser.add_argument("--output", default="bench/results.json", help="Where to write the results")
+    parser.add_argument("--compare", help="Results of an earlier run to compare the p95 times to")
+    parser.add_argument("--threshold", type=float, default=10, help="How many percent slower a p95 time can get before --compare reports a regression")
+    parser.add_argument("--no-memory", action="store_true", help="Skip the (slower) peak memory and allocations measuring run")
+    args = parser.parse_args()
+
+    for name in args.scenarios:
+        if name not in SCENARIOS: parser.error(f"unknown scenario \"{name}\" (choose from {', '.join(SCENARIOS)})")
+
+    totals = {f"{owner.__name__}.{name}": 0 for owner, name in TIMED_FUNCTIONS}
+    timeFunctions(totals)
+
+    results = {
+        "commit": gitCommit(),
+        "python": platform.python_version(),
+        "pygame": pygame.version.ver,
+        "tick_rate": settings.tick_rate,
+        "scenarios": {}
+    }
+
+    for name in args.scenarios or SCENARIOS:
+        print(f"Running {name}...", file=sys.stderr)
+
+        results["scenarios"][name] = timeScenario(SCENARIOS[name], totals)
+        if not args.no_memory: results["scenarios"][name]["memory"] = measureMemory(SCENARIOS[name])
+
+        total = results["scenarios"][name]["total"]
+        print(f"  {results['scenarios'][name]['frames']} frames, p50 {total['p50']} ms, p95 {total['p95']} ms, p99 {total['p99']} ms, max {total['max']} ms (a step is {1000 / settings.tick_rate:g} ms)", file=sys.stderr)
+
+        if not args.no_memory:
+            memory = results["scenarios"][name]["memory"]
+            print(f"  peak {memory['peak_kib_p95']} KiB (p95), {memory['allocations_per_frame_mean']} allocations per frame (max {memory['allocations_per_frame_max']}, {memory['allocated_kib_per_frame_mean']} KiB)", file=sys.stderr)
+
+    with open(args.output, "w") as results_file: json.dump(results, results_file, indent=4)
+
+    print(f"Results written to {args.output}", file=sys.stderr)
+
+    if args.compare:
+        with open(args.compare) as previous_file: previous = json.load(previous_file)
+
+        if compare(previous, results, args.threshold): sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -11,7 +11,7 @@ class DBData:
     opened_save = None
 
     def __init__(self):
-        self.connection = sqlite3.connect("saves.db")
+        self.connection = sqlite3.connect(settings.saves_path)
         self.cursor = self.connection.cursor()
 
         # NOTE: Movement is stored as tinyint, so when its read, its final array is based on if its true or false
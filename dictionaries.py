@@ -1,37 +1,137 @@
+import pygame
 import utils
+import json
+import os
+import sys
+
+class TextureAtlas:
+    # NOTE: These variables are at class level, there is only one atlas
+    # Packs the small textures of the dictionaries below (every rotation separately) in to one image, so startup reads one file instead of ~80
+    # The atlas gets built from whatever was loaded on its own (first run or changed source files) and saved in cache/ for the next run
+
+    image_path = "cache/atlas.png"
+    index_path = "cache/atlas.json"
+    max_width = 2048
+
+    image = None
+    loaded = False
+    rects = {} # Keys are "path:rotation", values are the rects of the textures in the atlas image
+    sources = {} # Same keys, values are (path, rotation, source file stamp)
+    missing = {} # Same keys, values are the textures that werent in the atlas and got loaded on their own
+
+    def key(path, rotation):
+        return f"{path}:{rotation}"
+
+    def sourceStamp(path):
+        # Size and modification time, so the source files dont have to be opened to know if they changed
+        stat = os.stat(path)
+        return [stat.st_size, stat.st_mtime_ns]
+
+    def load():
+        TextureAtlas.loaded = True
+
+        if not (os.path.exists(TextureAtlas.image_path) and os.path.exists(TextureAtlas.index_path)): return
+
+        try:
+            with open(TextureAtlas.index_path) as index_file: index = json.load(index_file)
+        except (OSError, ValueError):
+            return # Broken index, the atlas will get rebuilt
+
+        TextureAtlas.image = pygame.image.load(TextureAtlas.image_path).convert_alpha()
+
+        for key, entry in index["textures"].items():
+            # Textures whose source file changed are left out, so they get loaded again (and the atlas rebuilt)
+            if not os.path.exists(entry["path"]) or TextureAtlas.sourceStamp(entry["path"]) != entry["stamp"]: continue
+
+            TextureAtlas.rects[key] = pygame.Rect(entry["rect"])
+            TextureAtlas.sources[key] = (entry["path"], entry["rotation"], entry["stamp"])
+
+    def get(path, rotation=0):
+        # Returns the texture, scaled up the same way as loadScaledAsset()
+        if not TextureAtlas.loaded: TextureAtlas.load()
+
+        key = TextureAtlas.key(path, rotation)
+
+        if key in TextureAtlas.rects: return TextureAtlas.image.subsurface(TextureAtlas.rects[key])
+
+        texture = utils.loadScaledAsset(path, rotation=rotation).convert_alpha()
+
+        TextureAtlas.missing[key] = texture
+        TextureAtlas.sources[key] = (path, rotation, TextureAtlas.sourceStamp(path))
+
+        return texture
+
+    def save():
+        # Rebuilds and saves the atlas if any texture had to be loaded on its own
+        if not TextureAtlas.missing: return
+
+        textures = {key: TextureAtlas.image.subsurface(rect) for key, rect in TextureAtlas.rects.items()}
+        textures.update(TextureAtlas.missing)
+
+        # Shelf packing: tallest textures first, placed left to right in rows
+        rects = {}
+        x, y, row_height = 0, 0, 0
+
+        for key in sorted(textures, key=lambda key: (-textures[key].get_height(), key)):
+            width, height = textures[key].get_size()
+
+            if x + width > TextureAtlas.max_width:
+                x, y, row_height = 0, y + row_height, 0
+
+            rects[key] = pygame.Rect(x, y, width, height)
+            x += width
+            row_height = max(row_height, height)
+
+        atlas = pygame.Surface((TextureAtlas.max_width, y + row_height), pygame.SRCALPHA)
+        atlas.fill((0, 0, 0, 0))
+
+        # Adding on to a fully transparent surface copies the pixels exactly (a normal blit would blend the semi transparent ones)
+        for key, rect in rects.items(): atlas.blit(textures[key], rect, special_flags=pygame.BLEND_RGBA_ADD)
+
+        index = {"textures": {}}
+        for key, rect in rects.items():
+            path, rotation, stamp = TextureAtlas.sources[key]
+            index["textures"][key] = {"path": path, "rotation": rotation, "stamp": stamp, "rect": list(rect)}
+
+        os.makedirs(os.path.dirname(TextureAtlas.image_path), exist_ok=True)
+        pygame.image.save(atlas, TextureAtlas.image_path)
+
+        with open(TextureAtlas.index_path, "w") as index_file: json.dump(index, index_file, indent=1)
+
+        TextureAtlas.missing = {}
 
 class Crystals:
     dictionary = {} # Dictionary with keys as names and loaded crystal textures for values
 
     def loadCrystalTextures():
-        Crystals.dictionary["quartz"]     = utils.loadScaledAsset("assets/crystals/quartz.png").convert_alpha()
-        Crystals.dictionary["jade"]       = utils.loadScaledAsset("assets/crystals/jade.png").convert_alpha()
-        Crystals.dictionary["topaz"]      = utils.loadScaledAsset("assets/crystals/topaz.png").convert_alpha()
-        Crystals.dictionary["sapphire"]   = utils.loadScaledAsset("assets/crystals/sapphire.png").convert_alpha()
-        Crystals.dictionary["ruby"]       = utils.loadScaledAsset("assets/crystals/ruby.png").convert_alpha()
-        Crystals.dictionary["aquamarine"] = utils.loadScaledAsset("assets/crystals/aquamarine.png").convert_alpha()
-        Crystals.dictionary["painite"]    = utils.loadScaledAsset("assets/crystals/painite.png").convert_alpha()
-        Crystals.dictionary["celestine"]  = utils.loadScaledAsset("assets/crystals/celestine.png").convert_alpha()
-        Crystals.dictionary["diamond"]    = utils.loadScaledAsset("assets/crystals/diamond.png").convert_alpha()
+        Crystals.dictionary["quartz"]     = TextureAtlas.get("assets/crystals/quartz.png")
+        Crystals.dictionary["jade"]       = TextureAtlas.get("assets/crystals/jade.png")
+        Crystals.dictionary["topaz"]      = TextureAtlas.get("assets/crystals/topaz.png")
+        Crystals.dictionary["sapphire"]   = TextureAtlas.get("assets/crystals/sapphire.png")
+        Crystals.dictionary["ruby"]       = TextureAtlas.get("assets/crystals/ruby.png")
+        Crystals.dictionary["aquamarine"] = TextureAtlas.get("assets/crystals/aquamarine.png")
+        Crystals.dictionary["painite"]    = TextureAtlas.get("assets/crystals/painite.png")
+        Crystals.dictionary["celestine"]  = TextureAtlas.get("assets/crystals/celestine.png")
+        Crystals.dictionary["diamond"]    = TextureAtlas.get("assets/crystals/diamond.png")
 
 class Scraps:
     dictionary = {} # Dictionary with keys as names and loaded scrap textures for values
 
     def loadScrapTextures():
-        Scraps.dictionary["brass"]     = utils.loadScaledAsset("assets/scraps/brass.png").convert_alpha()
-        Scraps.dictionary["copper"]    = utils.loadScaledAsset("assets/scraps/copper.png").convert_alpha()
-        Scraps.dictionary["lead"]      = utils.loadScaledAsset("assets/scraps/lead.png").convert_alpha()
-        Scraps.dictionary["magnesium"] = utils.loadScaledAsset("assets/scraps/magnesium.png").convert_alpha()
-        Scraps.dictionary["silver"]    = utils.loadScaledAsset("assets/scraps/silver.png").convert_alpha()
-        Scraps.dictionary["tungsten"]  = utils.loadScaledAsset("assets/scraps/tungsten.png").convert_alpha()
-        Scraps.dictionary["platinum"]  = utils.loadScaledAsset("assets/scraps/platinum.png").convert_alpha()
-        Scraps.dictionary["cobalt"]    = utils.loadScaledAsset("assets/scraps/cobalt.png").convert_alpha()
-        Scraps.dictionary["palladium"] = utils.loadScaledAsset("assets/scraps/palladium.png").convert_alpha()
-        Scraps.dictionary["titanium"]  = utils.loadScaledAsset("assets/scraps/titanium.png").convert_alpha()
-        Scraps.dictionary["gold"]      = utils.loadScaledAsset("assets/scraps/gold.png").convert_alpha()
-        Scraps.dictionary["indium"]    = utils.loadScaledAsset("assets/scraps/indium.png").convert_alpha()
-        Scraps.dictionary["adamatite"] = utils.loadScaledAsset("assets/scraps/adamatite.png").convert_alpha()
-        Scraps.dictionary["luminite"]  = utils.loadScaledAsset("assets/scraps/luminite.png").convert_alpha()
+        Scraps.dictionary["brass"]     = TextureAtlas.get("assets/scraps/brass.png")
+        Scraps.dictionary["copper"]    = TextureAtlas.get("assets/scraps/copper.png")
+        Scraps.dictionary["lead"]      = TextureAtlas.get("assets/scraps/lead.png")
+        Scraps.dictionary["magnesium"] = TextureAtlas.get("assets/scraps/magnesium.png")
+        Scraps.dictionary["silver"]    = TextureAtlas.get("assets/scraps/silver.png")
+        Scraps.dictionary["tungsten"]  = TextureAtlas.get("assets/scraps/tungsten.png")
+        Scraps.dictionary["platinum"]  = TextureAtlas.get("assets/scraps/platinum.png")
+        Scraps.dictionary["cobalt"]    = TextureAtlas.get("assets/scraps/cobalt.png")
+        Scraps.dictionary["palladium"] = TextureAtlas.get("assets/scraps/palladium.png")
+        Scraps.dictionary["titanium"]  = TextureAtlas.get("assets/scraps/titanium.png")
+        Scraps.dictionary["gold"]      = TextureAtlas.get("assets/scraps/gold.png")
+        Scraps.dictionary["indium"]    = TextureAtlas.get("assets/scraps/indium.png")
+        Scraps.dictionary["adamatite"] = TextureAtlas.get("assets/scraps/adamatite.png")
+        Scraps.dictionary["luminite"]  = TextureAtlas.get("assets/scraps/luminite.png")
 
 class AccessCards:
     # NOTE: A single card is good for 2 rooms
@@ -39,15 +139,22 @@ class AccessCards:
     dictionary = [] # The indexes + 1 represent the level (its still a dictionary even though its a list)
 
     def loadCardTextures():
-        AccessCards.dictionary.append(utils.loadScaledAsset("assets/cards/level_1.png").convert_alpha())
-        AccessCards.dictionary.append(utils.loadScaledAsset("assets/cards/level_2.png").convert_alpha())
-        AccessCards.dictionary.append(utils.loadScaledAsset("assets/cards/level_3.png").convert_alpha())
-        AccessCards.dictionary.append(utils.loadScaledAsset("assets/cards/level_4.png").convert_alpha())
-        AccessCards.dictionary.append(utils.loadScaledAsset("assets/cards/level_5.png").convert_alpha())
-        AccessCards.dictionary.append(utils.loadScaledAsset("assets/cards/level_6.png").convert_alpha())
-        AccessCards.dictionary.append(utils.loadScaledAsset("assets/cards/level_7.png").convert_alpha())
-        AccessCards.dictionary.append(utils.loadScaledAsset("assets/cards/level_8.png").convert_alpha())
-        AccessCards.dictionary.append(utils.loadScaledAsset("assets/cards/level_9.png").convert_alpha())
+        AccessCards.dictionary.append(TextureAtlas.get("assets/cards/level_1.png"))
+        AccessCards.dictionary.append(TextureAtlas.get("assets/cards/level_2.png"))
+        AccessCards.dictionary.append(TextureAtlas.get("assets/cards/level_3.png"))
+        AccessCards.dictionary.append(TextureAtlas.get("assets/cards/level_4.png"))
+        AccessCards.dictionary.append(TextureAtlas.get("assets/cards/level_5.png"))
+        AccessCards.dictionary.append(TextureAtlas.get("assets/cards/level_6.png"))
+        AccessCards.dictionary.append(TextureAtlas.get("assets/cards/level_7.png"))
+        AccessCards.dictionary.append(TextureAtlas.get("assets/cards/level_8.png"))
+        AccessCards.dictionary.append(TextureAtlas.get("assets/cards/level_9.png"))
+
+# Rotation key of the first bit group (in r0, r90, r180, r-90 order) that is fully set in the mask, None if none of them are
+def maskRotation(mask, bit_groups):
+    for rotation, bits in zip(("r0", "r90", "r180", "r-90"), bit_groups):
+        if mask & bits == bits: return rotation
+
+    return None
 
 class Tiles:
     size = 72 # To be compatible with 4x scaling
@@ -90,16 +197,80 @@ class Tiles:
         (255, 180, 100, 255): 11 # Glass box
     }
 
+    # Same as the dictionary, but with the colors packed in to one integer (the same way the bytes of an RGBA pixel are read as an unsigned int)
+    packed_dictionary = {int.from_bytes(bytes(color), sys.byteorder): tile for color, tile in dictionary.items()}
+
+    def decodeTilesheet(tilesheet, tilesheet_path=""):
+        # Returns the tilemap (2D list of tile codes) of the tilesheet, every pixel is read as one packed RGBA integer and mapped in one go
+        width, height = tilesheet.get_size()
+
+        # Opaque surfaces dont have real alpha bytes, so copy it on to one that does first
+        rgba_tilesheet = pygame.Surface((width, height), pygame.SRCALPHA)
+        rgba_tilesheet.blit(tilesheet, (0, 0))
+
+        pixels = memoryview(pygame.image.tobytes(rgba_tilesheet, "RGBA")).cast("I")
+        tiles = list(map(Tiles.packed_dictionary.get, pixels))
+
+        # Report every unknown color and where it is, instead of failing on the first one
+        if None in tiles:
+            unknown_colors = {}
+
+            for idx, tile in enumerate(tiles):
+                if tile is None: unknown_colors.setdefault(tuple(pixels[idx].to_bytes(4, sys.byteorder)), []).append((idx % width, idx // width))
+
+            raise ValueError(f"Unknown tile colors in {tilesheet_path or 'the tilesheet'}: " + ", ".join(
+                f"{color} at {positions[:5]}{' and ' + str(len(positions) - 5) + ' more' if len(positions) > 5 else ''}" for color, positions in unknown_colors.items()
+            ))
+
+        return [tiles[y * width:(y + 1) * width] for y in range(height)]
+
+    # Autotiling
+    # Neighbour masks have one bit per neighbour: 0 down, 1 right, 2 up, 3 left, 4 up-left, 5 down-left, 6 down-right, 7 up-right
+    neighbour_offsets = [(1, 0), (0, 1), (-1, 0), (0, -1), (-1, -1), (1, -1), (1, 1), (-1, 1)] # (di, dj) of every bit
+
+    facing_rotations       = [maskRotation(mask, (0b0001, 0b0010, 0b0100, 0b1000)) for mask in range(16)] # Cardinal bits of what the tile is facing
+    outer_corner_rotations = [maskRotation(mask, (0b1100, 0b1001, 0b0011, 0b0110)) for mask in range(16)] # Cardinal bits of the empty neighbours
+    inner_corner_rotations = [maskRotation(mask, (0b00010011, 0b00100110, 0b01001100, 0b10001001)) for mask in range(256)] # Cardinal bits of the open neighbours + diagonal bits of the empty ones
+
+    def neighbourMasks(cells, off_map=False):
+        # Returns the neighbour mask of every cell of the 2D list of bools, built one neighbour direction (and one row) at a time
+        height, width = len(cells), len(cells[0])
+
+        padded = [[off_map] * (width + 2)] + [[off_map] + list(row) + [off_map] for row in cells] + [[off_map] * (width + 2)]
+        masks = [[0] * width for _ in range(height)]
+
+        for bit, (di, dj) in enumerate(Tiles.neighbour_offsets):
+            for i in range(height):
+                masks[i] = [mask | (1 << bit) if neighbour else mask for mask, neighbour in zip(masks[i], padded[i + 1 + di][1 + dj:1 + dj + width])]
+
+        return masks
+
     wall_tiles = {}
     floor_tiles = {}
     object_tiles = {}
     other_tiles = {}
+    laser_masks = {} # Collision masks of straight laser beams, keys are (horizontal, length in tiles)
+    filled_masks = {} # Fully set masks, keys are their sizes
+
+    def filledMask(size):
+        # Fully set mask of the given size (for erasing an area from a mask), only made once per size
+        if size not in Tiles.filled_masks:
+            Tiles.filled_masks[size] = pygame.Mask(size, fill=True)
+
+        return Tiles.filled_masks[size]
+
+    def laserBeamMask(horizontal, length):
+        # Mask of a straight laser beam (the size of the laser beam scaled up) thats length tiles long, only made once per size
+        if (horizontal, length) not in Tiles.laser_masks:
+            Tiles.laser_masks[(horizontal, length)] = pygame.Mask((Tiles.size * length, 6 * 4) if horizontal else (6 * 4, Tiles.size * length), fill=True)
+
+        return Tiles.laser_masks[(horizontal, length)]
 
     def loadTileTextures():
         # Quick utility function
         def loadTile(category, file_name, key, all_rotations=True, specific_rotations=[0, 90, 180, -90]):
             for rot in specific_rotations:
-                loaded_image = utils.loadScaledAsset("assets/tiles/" + file_name + ".png", rotation=rot).convert_alpha()
+                loaded_image = TextureAtlas.get("assets/tiles/" + file_name + ".png", rot)
 
                 new_key = key
                 if all_rotations: new_key = f"{key}_r{rot}" # Rotated tiles have different keys ("WLN" and "WLN_r90" for example)
@@ -145,3 +316,7 @@ class Tiles:
         # Laser parts only need horizontal and vertical
         loadTile("other", "laser",     "LAS", specific_rotations=[0, 90])
         loadTile("other", "laser_bit", "LSB", specific_rotations=[0, 90])
+
+        # Single tile laser masks (longer ones get added the first time a beam that long is drawn)
+        Tiles.laserBeamMask(True, 1)
+        Tiles.laserBeamMask(False, 1)
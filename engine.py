@@ -6,6 +6,8 @@ import utils
 import math
 import scene
 import data
+import time
+from concurrent.futures import ThreadPoolExecutor
 from dictionaries import *
 
 # NOTE in case this game is to be expanded: When a room passes "to_be_continued" as the next room, it pushes a new ToBeContinued() scene
@@ -21,12 +23,18 @@ class GameEngine:
         self.play_again_trans.fill((0, 0, 0))
         self.play_again_trans.set_alpha(0)
 
+        # Dirty rect rendering variables (only used if settings.dirty_rendering is on)
+        self.full_redraw = True # Set by invalidate() when the next frame has to be fully redrawn
+        self.invalidated_rects = [] # Screen rects reported by invalidate()
+        self.last_camera_pos = None
+        self.last_room_map = None
+        self.screen_covered = True # If something else drew over the screen last frame (scene transitions)
+
     def gameStart(self):
         # Rendering layers
-        self.layer_1     = pygame.Surface((glb.screen_width, glb.screen_height), pygame.SRCALPHA) # The closest layer to the view (for UI and transitions)
-        self.layer_2     = pygame.Surface((glb.screen_width, glb.screen_height), pygame.SRCALPHA) # The layer 2nd closest to the view (for the player and entities)
-        self.layer_3     = pygame.Surface((glb.screen_width, glb.screen_height)                 ) # The layer 3rd closest to the view (for the map, objects and dropped items)
-        self.final_layer = pygame.Surface((glb.screen_width, glb.screen_height)                 ) # The layer for combining all of the other ones (DO NOT DRAW ON IT)
+        self.layer_1     = utils.RenderLayer((glb.screen_width, glb.screen_height), pygame.SRCALPHA) # The closest layer to the view (for UI and transitions)
+        self.layer_2     = utils.RenderLayer((glb.screen_width, glb.screen_height), pygame.SRCALPHA) # The layer 2nd closest to the view (for the player and entities)
+        self.layer_3     = utils.RenderLayer((glb.screen_width, glb.screen_height)                 ) # The layer 3rd closest to the view (for the map, objects and dropped items)
 
         def playAgain():
             self.trans_to_new_game = True
@@ -112,8 +120,8 @@ class GameEngine:
 
         # Optional hints stuff
         if settings.hints:
-            if settings.movement[0] == pygame.K_w: self.keys_hint = utils.loadScaledAsset("assets/ui/keys.png")
-            else:                                  self.keys_hint = utils.loadScaledAsset("assets/ui/keys_arrows.png")
+            if settings.movement[0] == pygame.K_w: self.keys_hint = utils.loadScaledAsset("assets/ui/keys.png", copy=True)
+            else:                                  self.keys_hint = utils.loadScaledAsset("assets/ui/keys_arrows.png", copy=True)
 
             self.keys_hint_current_alpha = 0
             self.keys_hint_target_alpha = 0 # It gets set to 255 later
@@ -256,15 +264,71 @@ class GameEngine:
                 if self.death_menu.get_alpha() < 255:
                     self.death_menu.set_alpha(self.death_menu.get_alpha() + 15)
 
+    def invalidate(self, rect=None):
+        # For things that change a big surface in place (the map image, the laser surface...), which the dirty rect rendering cant notice on its own
+        # rect is in screen coords, None means the whole screen has to be redrawn
+        if rect is None: self.full_redraw = True
+        else:            self.invalidated_rects.append(pygame.Rect(rect))
+
     def draw(self, screen):
-        # Prepare layer_1 and layer_2 for drawing (layer_3 doesn't need this because it is getting refreshed with the map)
-        self.layer_1.fill((0, 0, 0, 0))
-        self.layer_2.fill((0, 0, 0, 0))
+        # Returns the list of screen rects that changed, or None if the whole screen has to be updated
+        layers = [self.layer_3, self.layer_2, self.layer_1] # In the order they get combined
+
+        if not settings.dirty_rendering:
+            # Prepare layer_1 and layer_2 for drawing (layer_3 doesn't need this because it is getting refreshed with the map)
+            self.layer_1.fill((0, 0, 0, 0))
+            self.layer_2.fill((0, 0, 0, 0))
+
+            self.drawLayers()
+
+            # Put the layers straight on the screen, layer_3 is opaque and covers all of it so it goes first
+            for layer in layers: screen.blit(layer, (0, 0))
+
+            self.full_redraw = True # In case the dirty rect rendering gets turned on
+            return None
+
+        # Dirty rect rendering: record what gets drawn this frame and only redraw where it differs from the last frame
+        for layer in layers: layer.startRecording()
+        self.drawLayers()
+        for layer in layers: layer.stopRecording()
+
+        screen_rect = screen.get_rect()
+
+        # Fall back to a full redraw when everything moves anyway (camera, room change) or when a full screen overlay is involved
+        if (self.full_redraw or self.screen_covered or glb.scene_manager.transition.active or
+            self.camera.rect.topleft != self.last_camera_pos or self.rm.current_room_map is not self.last_room_map or
+            self.rm.room_transition.active or self.paused or self.pause_menu.get_alpha() > 0 or self.game_over or self.play_again_trans.get_alpha() > 0):
+            dirty_rects = [screen_rect]
+
+        else:
+            dirty_rects = utils.mergeRects([rect for rect in self.invalidated_rects + [rect for layer in layers for rect in layer.changedRects()] if rect.width and rect.height])
+
+            # If most of the screen changed, one big redraw is cheaper than a lot of small ones
+            if sum(rect.width * rect.height for rect in dirty_rects) > screen_rect.width * screen_rect.height // 2:
+                dirty_rects = [screen_rect]
+
+        # Redraw the layers only inside of the dirty rects and put them on the screen
+        for rect in dirty_rects:
+            self.layer_1.fill((0, 0, 0, 0), rect)
+            self.layer_2.fill((0, 0, 0, 0), rect)
+
+            for layer in layers:
+                layer.replay(rect)
+                screen.blit(layer, rect.topleft, rect)
+
+        self.full_redraw = False
+        self.invalidated_rects = []
+        self.last_camera_pos = self.camera.rect.topleft
+        self.last_room_map = self.rm.current_room_map
+        self.screen_covered = glb.scene_manager.transition.active # The fade gets drawn over the screen after this
 
+        return dirty_rects
+
+    def drawLayers(self):
         # Draw the player sprite, healthbar and staminabar
         self.layer_2.blit(self.player.image, self.camera.apply(self.player.rect))
         self.layer_1.blit(self.player.healthbar, (100, 20))
-        pygame.draw.rect(self.layer_1, (0, 93, 93), (104, 48, self.player.stamina, 8))
+        self.layer_1.drawRect((0, 93, 93), (104, 48, self.player.stamina, 8))
 
         self.player.inventory.draw(self.layer_1)
         self.player.facility_map.draw(self.layer_1)
@@ -322,14 +386,9 @@ class GameEngine:
         if self.play_again_trans.get_alpha() > 0:
             self.layer_1.blit(self.play_again_trans, (0, 0))
 
-        # Combine all of the layers in to the final one
-        self.final_layer.blit(self.layer_3, (0, 0))
-        self.final_layer.blit(self.layer_2, (0, 0))
-        self.final_layer.blit(self.layer_1, (0, 0))
-
-        screen.blit(self.final_layer, (0, 0))
-
 class RoomManager:
+    preload_executor = ThreadPoolExecutor(max_workers=1) # Shared by every RoomManager (a new game makes a new one), only reads files and makes blank surfaces, converting and the objects are done on the main thread
+
     class RoomTransition:
         def __init__(self):
             self.active = False
@@ -375,13 +434,23 @@ class RoomManager:
                     # Regular room entering
                     glb.engine.rm.current_room_name = self.next_room
 
-                    # Get the map and instantiate it, if the room is not active yet
+                    # Get the map and instantiate it, if the room is not active yet (usually it was already preloaded)
                     if self.next_room not in glb.engine.rm.active_rooms:
-                        glb.engine.rm.active_rooms[self.next_room] = glb.engine.rm.rooms[self.next_room]["map"]()
+                        glb.engine.rm.createRoom(self.next_room)
 
                     glb.engine.rm.current_room_map = glb.engine.rm.active_rooms[self.next_room]
+                    glb.engine.rm.current_room_map.finishBuilding() # In case the player got there before it was done preloading
                     glb.engine.rm.current_room_map.onEnter(self.prev_room)
 
+                    # Most recently visited rooms go last
+                    if self.next_room in glb.engine.rm.visited_rooms: glb.engine.rm.visited_rooms.remove(self.next_room)
+                    glb.engine.rm.visited_rooms.append(self.next_room)
+
+                    # Start getting the rooms after this one ready
+                    glb.engine.rm.preloaded_rooms.discard(self.next_room)
+                    glb.engine.rm.preloadAdjacentRooms()
+                    glb.engine.rm.evictRooms()
+
                     # Update player and camera attributes
                     glb.engine.player.setLimits(glb.engine.rm.current_room_map.map_rect, glb.engine.rm.current_room_map.map_borders)
                     glb.engine.camera.setSize(glb.engine.rm.current_room_map.map_image.get_size()[0], glb.engine.rm.current_room_map.map_image.get_size()[1])
@@ -439,6 +508,131 @@ class RoomManager:
 
         self.room_transition = self.RoomTransition()
 
+        # Background preloading of the rooms the player can go to next (on RoomManager.preload_executor)
+        self.preloading = {} # Room name -> future of its baked map being read
+        self.preloaded_rooms = set() # Rooms in active_rooms that were created ahead of time and havent been entered yet
+        self.building_rooms = [] # Preloaded rooms that still have build steps left, built in this order
+
+        # Entered rooms from the least to the most recently visited, for evicting them
+        self.visited_rooms = [self.current_room_name]
+        self.snapshots = {} # Room name -> snapshotState() of the evicted rooms the player has been in, given back to the room when it gets created again
+
+        self.preloadAdjacentRooms()
+
+    def createRoom(self, room_name):
+        # Instantiates the room and adds it to the active rooms, using its preloaded baked map if there is one
+        if room_name in self.preloading:
+            bake_key, preloaded = self.preloading.pop(room_name).result() # Waits if it isnt done yet, which is still faster than reading it again
+            if preloaded is not None: LevelRoom.preloaded_maps[bake_key] = preloaded
+
+        # Rooms that were evicted come back the way the player left them
+        if room_name in self.snapshots: self.active_rooms[room_name] = self.rooms[room_name]["map"](self.snapshots.pop(room_name))
+        else:                           self.active_rooms[room_name] = self.rooms[room_name]["map"]()
+
+    def readRoom(self, room_class):
+        # Runs on the preloading thread, reads the baked map and makes the blank map image and laser surface for it
+        # Making big surfaces takes a while too (the memory gets cleared), but it doesnt need the display like converting does
+        bake_key = LevelRoom.bakeKey(room_class.tilesheet_path, room_class.laser["start"])
+        baked = LevelRoom.readBakedMap(bake_key)
+
+        if baked is None: return bake_key, None
+
+        map_size = baked[3].get_size()
+
+        return bake_key, (baked, pygame.Surface(map_size, 0, glb.screen), pygame.Surface(map_size, pygame.SRCALPHA))
+
+    def preloadAdjacentRooms(self):
+        # Starts reading the baked maps of the rooms connected to the current one on the preloading thread
+        if not settings.preload_rooms: return
+
+        for room_name in self.rooms[self.current_room_name]["connections"]:
+            if room_name not in self.rooms or room_name in self.active_rooms or room_name in self.preloading: continue
+
+            # Only level rooms have baked maps
+            room_class = self.rooms[room_name]["map"]
+            if not issubclass(room_class, LevelRoom): continue
+
+            self.preloading[room_name] = RoomManager.preload_executor.submit(self.readRoom, room_class)
+
+    def updatePreloading(self):
+        # Creates the rooms whose baked maps finished reading (only one per frame), then builds them a few steps at a time until settings.preload_frame_time is used up
+        deadline = time.perf_counter() + settings.preload_frame_time
+
+        for room_name, future in self.preloading.items():
+            if not future.done(): continue
+
+            LevelRoom.build_in_steps = True
+
+            try:     self.createRoom(room_name)
+            finally: LevelRoom.build_in_steps = False # Even if creating it failed, or every room after it would be left unbuilt
+
+            self.preloaded_rooms.add(room_name)
+            self.building_rooms.append(room_name)
+
+            break
+
+        while self.building_rooms and time.perf_counter() < deadline:
+            room = self.active_rooms[self.building_rooms[0]]
+            next(room.build_steps, None)
+
+            if room.built:
+                self.building_rooms.pop(0)
+                self.evictRooms()
+
+    def roomMemory(self, room):
+        # Rough size of the room's big surfaces in bytes
+        size = 0
+
+        for surface in (getattr(room, "map_image", None), getattr(room, "laser_surf", None)):
+            if isinstance(surface, utils.ChunkedSurface): chunks = surface.chunks.values()
+            elif surface is not None:                     chunks = [surface]
+            else:                                         chunks = []
+
+            size += sum(chunk.get_width() * chunk.get_height() * chunk.get_bytesize() for chunk in chunks)
+
+        return size
+
+    def roomDistances(self):
+        # How many connections away every room is from the current one
+        distances = {self.current_room_name: 0}
+        queue = [self.current_room_name]
+
+        for room_name in queue:
+            for next_room_name in self.rooms[room_name]["connections"]:
+                if next_room_name in self.rooms and next_room_name not in distances:
+                    distances[next_room_name] = distances[room_name] + 1
+                    queue.append(next_room_name)
+
+        return distances
+
+    def evictRoom(self, room_name):
+        # Drops the room and its surfaces, keeping only a snapshot of its state if the player has been in it
+        room = self.active_rooms.pop(room_name)
+
+        if room_name in self.building_rooms:
+            self.building_rooms.remove(room_name)
+
+            # A room that isnt built yet can give back its old snapshot if it hasnt restored it, but if it has, it needs the rest of the steps to be snapshotted again
+            if room_name in self.visited_rooms and room.snapshot is None: room.finishBuilding()
+
+        if room_name in self.visited_rooms: self.snapshots[room_name] = room.snapshotState() if room.built else room.snapshot
+
+        self.preloaded_rooms.discard(room_name)
+
+    def evictRooms(self):
+        # Drops the preloaded (not entered yet) rooms furthest away from the current one while the active rooms go over the memory budget
+        distances = self.roomDistances()
+        evictable = sorted(self.preloaded_rooms, key=lambda room_name: distances.get(room_name, len(self.rooms)))
+
+        while evictable and sum(self.roomMemory(room) for room in self.active_rooms.values()) > settings.preload_memory_budget:
+            self.evictRoom(evictable.pop())
+
+        # Only keep the most recently visited level rooms alive, the rest get snapshotted (other rooms have state that cant be snapshotted, so they always stay)
+        live_rooms = [room_name for room_name in self.visited_rooms if room_name not in self.preloaded_rooms and isinstance(self.active_rooms.get(room_name), LevelRoom)]
+
+        while len(live_rooms) > max(settings.max_live_rooms, 1) and live_rooms[0] != self.current_room_name:
+            self.evictRoom(live_rooms.pop(0))
+
     def moveTo(self, new_room_name):
         # Check if the 'new_room' is connected to the current room or if it is to be continued
         if new_room_name in self.rooms[self.current_room_name]["connections"] or new_room_name == "to_be_continued":
@@ -483,7 +677,10 @@ class RoomManager:
             if isinstance(item, ClickableItem): # Check if its a ClickableItem or subclass of it
                 item.input(input_stream)
 
+    @utils.Profiler.timed
     def update(self):
+        self.updatePreloading()
+
         self.current_room_map.update()
 
         # Only when the crystal machine is turned on, allow background processing for crystal growing
@@ -491,15 +688,33 @@ class RoomManager:
 
         if self.room_transition.active: self.room_transition.update()
 
+        # Call update() for the objects and dropped items that animate (their timers count updates, so they only get read when drawing)
+        for object in self.current_room_map.objects:
+            if type(object) is LaserMachine or type(object) is CrystalMachine:
+                object.update()
+
+        for item in self.current_room_map.dropped_items:
+            if type(item) is PaperItem:
+                item.update()
+
         # Call the update() for all of the entities in the current room
         for entity in self.current_room_map.entities:
             entity.update()
 
+        if utils.Profiler.enabled: utils.Profiler.count("entity updates", len(self.current_room_map.entities))
+
+    @utils.Profiler.timed
     def draw(self, layers):
         # For optimization
         visible_rect = pygame.Rect(-(glb.engine.camera.rect.x), -(glb.engine.camera.rect.y), glb.screen_width, glb.screen_height)
 
-        layers[2].blit(self.current_room_map.map_image, (0, 0), visible_rect) # Only blit it where its visible
+        # Only blit it where its visible
+        if isinstance(self.current_room_map.map_image, utils.ChunkedSurface):
+            self.current_room_map.map_image.blitTo(layers[2], (0, 0), visible_rect)
+            self.current_room_map.map_image.evictChunks(visible_rect.inflate(visible_rect.width * 2, visible_rect.height * 2)) # Keep the ones around the view so walking back doesnt redraw them
+
+        else:
+            layers[2].blit(self.current_room_map.map_image, (0, 0), visible_rect)
 
         # Draw the static objects of the current room
         for object in self.current_room_map.objects:
@@ -530,7 +745,8 @@ class RoomManager:
 
         # If the current room is a subclass of LevelRoom also blit its lasers
         if isinstance(self.current_room_map, LevelRoom):
-            layers[2].blit(self.current_room_map.laser_surf, (0, 0), visible_rect) # Same as the map_image
+            if isinstance(self.current_room_map.laser_surf, utils.ChunkedSurface): self.current_room_map.laser_surf.blitTo(layers[2], (0, 0), visible_rect)
+            else:                                                                 layers[2].blit(self.current_room_map.laser_surf, (0, 0), visible_rect) # Same as the map_image
 
         if self.room_transition.active: self.room_transition.draw(layers[0]) # Blit to layer_1
 
@@ -657,7 +873,7 @@ class ObjectivesManager:
             if self.time_opened != 300:
                 visual_length = 240 / 300 * self.time_opened
 
-                pygame.draw.rect(layer_1, (255, 5, 5), pygame.Rect(self.button_rect.x + 56, self.button_rect.y + 200, visual_length, 4))
+                layer_1.drawRect((255, 5, 5), pygame.Rect(self.button_rect.x + 56, self.button_rect.y + 200, visual_length, 4))
 
 class Camera:
     def __init__(self, pos_x, pos_y):
@@ -726,33 +942,54 @@ class CollidableEntity(pygame.sprite.Sprite):
             map_rect.right  - borders[3]
         ]
 
+    # Returns where the entity ends up when moving from start_pos to end_pos along one axis, backed off if that is inside a static object
+    def pushOutOfStaticMask(self, static_mask, start_pos, end_pos):
+        if not self.collision_mask.overlap(static_mask, (-int(end_pos[0]), -int(end_pos[1]))): return end_pos
+
+        # Unless the entity was already stuck in something before the move, then let it walk out freely
+        if self.collision_mask.overlap(static_mask, (-int(start_pos[0]), -int(start_pos[1]))): return end_pos
+
+        # Get how far the entity got in to the static objects on this axis
+        overlap_rects = self.collision_mask.overlap_mask(static_mask, (-int(end_pos[0]), -int(end_pos[1]))).get_bounding_rects()
+        overlap_rect = overlap_rects[0].unionall(overlap_rects[1:])
+
+        move_x, move_y = end_pos[0] - start_pos[0], end_pos[1] - start_pos[1]
+
+        # Push it back out by that much in the opposite direction of the move (rounded up to whole 2px steps, so it stays on the grid), but never further back than it moved
+        push_x = min(overlap_rect.width  + overlap_rect.width  % 2, abs(move_x))
+        push_y = min(overlap_rect.height + overlap_rect.height % 2, abs(move_y))
+
+        pushed_pos = (end_pos[0] + (-push_x if move_x > 0 else push_x if move_x < 0 else 0), end_pos[1] + (-push_y if move_y > 0 else push_y if move_y < 0 else 0))
+
+        # Oddly shaped objects can still overlap after the push, in that case just cancel the move
+        if self.collision_mask.overlap(static_mask, (-int(pushed_pos[0]), -int(pushed_pos[1]))): return start_pos
+
+        return pushed_pos
+
+    @utils.Profiler.timed
     def collideCheck(self, vx, vy, speed = 4):
+        start_x, start_y = self.x, self.y
+
+        current_room = glb.engine.rm.current_room_map
+
+        # Check if the current room is a tiled room (LevelRoom)
+        if isinstance(current_room, LevelRoom): # Check if its a subclass of LevelRoom
+            start_rect = pygame.Rect(start_x, start_y, *self.rect.size)
+
+            # Only the tiles under the swept rect (where the entity is + where it would be) can be hit by this move
+            swept_rect = start_rect.union(start_rect.move(vx, vy))
+
+            # Only move as far as the nearby walls/doors/recievers allow
+            vx, vy = utils.sweptMove(start_rect, vx, vy, current_room.solidTileRects(swept_rect))
+
         self.x += vx
         self.y += vy
 
         # Update position
         self.rect.topleft = (self.x, self.y)
 
-        # Check if the current room is a tiled room (LevelRoom)
-        if isinstance(glb.engine.rm.current_room_map, LevelRoom): # Check if its a subclass of LevelRoom
-            # Go through all tiles and check if the entity would be standing on a wall/door if the move was applied
-            for i, row in enumerate(glb.engine.rm.current_room_map.tilemap):
-                for j, tile in enumerate(row):
-                    # If the current tile is a door or a wall or a reciever
-                    if tile in (2, 3, 5, 6):
-                        x = j * Tiles.size + glb.engine.rm.current_room_map.map_margin_x / 2
-                        y = i * Tiles.size + glb.engine.rm.current_room_map.map_margin_y / 2
-
-                        while self.rect.colliderect((x, y, Tiles.size, Tiles.size)):
-                            # Go back half a pixel until they don't collide anymore (because of the players speed 6 (goes in to half pixels))
-                            self.x += -2 if vx > 0 else 2 if vx < 0 else 0
-                            self.y += -2 if vy > 0 else 2 if vy < 0 else 0
-
-                            # Update the position
-                            self.rect.topleft = (self.x, self.y)
-
         # If its a regular room, check with limits
-        else:
+        if not isinstance(current_room, LevelRoom):
             # Wall collision detection
             if self.rect.right > self.limits[3]: # Right wall collision
                 self.x = self.limits[3] - self.rect.width
@@ -767,16 +1004,13 @@ class CollidableEntity(pygame.sprite.Sprite):
                 self.y = self.limits[0]
                 vy = 0
 
-        # Static object collision detection
-        for obj in glb.engine.rm.current_room_map.objects:
-            # Checking with mask overlap because it offers pixel perfect collisions
-            while self.collision_mask.overlap(obj.mask, (obj.rect.x - self.rect.x, obj.rect.y - self.rect.y)):
-                # Go back half a pixel until they don't collide anymore (because of the players speed 6 (goes in to half pixels))
-                self.x += -2 if vx > 0 else 2 if vx < 0 else 0
-                self.y += -2 if vy > 0 else 2 if vy < 0 else 0
+        # Static object collision detection (one query against the room's combined mask, checking with masks because it offers pixel perfect collisions)
+        # Resolved one axis at a time like utils.sweptMove(), so brushing the side of an object doesnt push the entity back on the axis that never hit it
+        static_mask = current_room.getStaticMask()
+        target_x, target_y = self.x, self.y
 
-                # Update position
-                self.rect.topleft = (self.x, self.y)
+        self.x = self.pushOutOfStaticMask(static_mask, (start_x, start_y), (target_x, start_y))[0]
+        self.y = self.pushOutOfStaticMask(static_mask, (self.x, start_y), (self.x, target_y))[1]
 
         # Update the position one more time
         self.rect.topleft = (self.x, self.y)
@@ -876,6 +1110,7 @@ class Player(CollidableEntity):
         # Update the blood vingette
         glb.engine.blood_vingette.set_alpha(255 - self.health * 2.5)
 
+    @utils.Profiler.timed
     def input(self, input_stream):
         self.inventory.input(input_stream)
         self.facility_map.input(input_stream)
@@ -999,23 +1234,28 @@ class Player(CollidableEntity):
                 if collidesMouse(current_room.crystal_machine.scrap_place.rect): return
 
             elif isinstance(current_room, LevelRoom):
-                for object in current_room.objects:
-                    # Check if its a Redirector or Blocker that the player can interact with
-                    if type(object) is Redirector or type(object) is Blocker:
-                        if current_room.interactable_redirectors and collidesMouse(object.rect): return
+                # Only the object on the tile under the cursor can be clicked
+                object = current_room.objectAt(current_room.tileAt((mouse_pos[0] - engine_camera.rect.x, mouse_pos[1] - engine_camera.rect.y)))
+
+                # Check if its a Redirector or Blocker that the player can interact with
+                if type(object) is Redirector or type(object) is Blocker:
+                    if current_room.interactable_redirectors and collidesMouse(object.rect): return
+
+                # Check if its an *unlocked* Locker
+                elif type(object) is Locker:
+                    if object.unlocked and collidesMouse(object.rect): return
 
-                    # Check if its an *unlocked* or opened Locker
-                    elif type(object) is Locker:
-                        if object.unlocked and collidesMouse(object.rect): return
-                        if object.opened and collidesMouse(object.opened_ui_rect, False): return
+                # Check if its an *unlocked* glass box and not empty
+                elif type(object) is GlassBox:
+                    if object.unlocked and object.item != None and collidesMouse(object.rect): return
 
-                    # Check if its an *unlocked* glass box and not empty
-                    elif type(object) is GlassBox:
-                        if object.unlocked and object.item != None and collidesMouse(object.rect): return
+                # Generally check if its a TileObject
+                elif isinstance(object, TileObject):
+                    if collidesMouse(object.rect): return
 
-                    # Generally check if its a TileObject
-                    elif isinstance(object, TileObject):
-                        if collidesMouse(object.rect): return
+                # Opened Lockers' UI goes outside of their tiles
+                for object in current_room.objects:
+                    if type(object) is Locker and object.opened and collidesMouse(object.opened_ui_rect, False): return
 
             # If none of the previous conditions ended the function: Actually attack
 
@@ -1096,6 +1336,8 @@ class Player(CollidableEntity):
             else:
                 self.weapon_cooldown = 0
 
+        self.facility_map.update()
+
         # Assemble the healthbar
         self.healthbar.fill((0, 0, 0, 0)) # Refresh
 
@@ -1107,7 +1349,7 @@ class Inventory:
     def __init__(self):
         self.slots = []
         self.slot_amounts = [] # List of amounts of individual items in slots (slots[2] = InventoryItem --> slot_amounts[2] = 7)
-        self.slot_amounts_font = utils.SmallFont((255, 255, 255, 255))
+        self.slot_amounts_font = utils.SmallFont((255, 255, 255, 255), True) # The counts are drawn every frame, so the numbers are rendered up front
         self.current_item_idx = -1 # When its -1 no items are selected
 
         self.weapon_slot = None
@@ -1227,7 +1469,7 @@ class Inventory:
     def draw(self, layer_1):
         # Draw an empty slot if the player has a too low access level
         if glb.engine.player.current_access_lvl == 0:
-            pygame.draw.rect(layer_1, (42, 24, 36), (glb.screen_width - 22 * 4, 32, 64, 40))
+            layer_1.drawRect((42, 24, 36), (glb.screen_width - 22 * 4, 32, 64, 40))
 
         else:
             layer_1.blit(AccessCards.dictionary[glb.engine.player.current_access_lvl - 1], (glb.screen_width - 22 * 4, 20))
@@ -1393,6 +1635,36 @@ class Automaton(CollidableEntity):
                     self.walking_to[1] <= self.rect.center[1] <= self.walking_to[1] + 4):
                     self.walking_to = None # Start going after the player again
 
+class ObjectGroup(pygame.sprite.Group):
+    # Sprite group for the static objects of a map, it remembers if any object was added or removed since the last time it was checked
+    # (so the map only rebakes its static collision mask when it actually has to)
+    # It also keeps a tile position -> object index for the objects that are placed on a tilemap
+    def __init__(self, *sprites):
+        self.changed = True
+        self.tile_index = {}
+        super().__init__(*sprites)
+
+    def tilePositions(self, sprite):
+        # Objects that cover more than one tile (lockers) list all of them in tile_positions
+        if hasattr(sprite, "tile_positions"): return sprite.tile_positions
+        if hasattr(sprite, "tile_pos"): return [sprite.tile_pos]
+
+        return []
+
+    def add_internal(self, sprite, layer=None):
+        super().add_internal(sprite, layer)
+        self.changed = True
+
+        for tile_pos in self.tilePositions(sprite):
+            self.tile_index[tile_pos] = sprite
+
+    def remove_internal(self, sprite):
+        super().remove_internal(sprite)
+        self.changed = True
+
+        for tile_pos in self.tilePositions(sprite):
+            if self.tile_index.get(tile_pos) is sprite: del self.tile_index[tile_pos]
+
 class Map:
     def __init__(self, map_path, map_borders):
         if data.DBData.player_name == glb.names[1] and map_borders == (144, 316, 144, 316):
@@ -1403,12 +1675,31 @@ class Map:
         self.map_rect = self.map_image.get_rect()
         self.map_borders = map_borders
 
-        self.objects = pygame.sprite.Group()
+        self.objects = ObjectGroup()
         self.entities = pygame.sprite.Group()
         self.dropped_items = pygame.sprite.Group()
 
+        self.static_mask = None # Combined collision mask of everything that can't move (see getStaticMask())
+
+    def getStaticMask(self):
+        # Rebake the mask only if an object has been added or removed since the last bake
+        if self.objects.changed or self.static_mask is None:
+            self.static_mask = pygame.Mask(self.map_image.get_size())
+            self.bakeStaticMask(self.static_mask)
+
+            self.objects.changed = False
+
+        return self.static_mask
+
+    def bakeStaticMask(self, mask):
+        # Draw every object's mask at its position in the room
+        for obj in self.objects:
+            mask.draw(obj.mask, obj.rect.topleft)
+
     def onEnter(self, entering_from): pass
 
+    def finishBuilding(self): pass # Only level rooms get built in steps (see LevelRoom.buildSteps())
+
     def input(self, input_stream): pass
 
     def update(self): pass
@@ -1427,7 +1718,7 @@ class BaseObject(pygame.sprite.Sprite):
         self.rect.x, self.rect.y = x, y
 
         if image_path == "assets/objects/laser_machine.png" and data.DBData.player_name == glb.names[0]:
-            self.image = pygame.image.load("assets/ui/unused/machine.png")
+            self.image = utils.displayFormat(pygame.image.load("assets/ui/unused/machine.png"))
 
         # Needed for collision detection / mouse hover
         self.mask = pygame.mask.from_surface(self.image)
@@ -1593,11 +1884,7 @@ class PaperItem(ClickableItem):
             case self.opened_y: self.hidePaper(input_stream)
             case self.closed_y: super().input(input_stream)
 
-    def draw(self, layer_1):
-        # Draw the UI all of the time EXEPT for when its fully closed
-        if self.current_y != self.closed_y:
-            layer_1.blit(self.paper_image, (self.x_pos, self.current_y))
-
+    def update(self):
         if self.target_y is not None and self.current_y != self.target_y:
             dy = self.target_y - self.current_y
 
@@ -1613,15 +1900,20 @@ class PaperItem(ClickableItem):
             if self.time_opened < self.time_opened_limit:
                 self.time_opened += 1
 
-            # When it has been opened for long enough start showing the close button
-            elif self.time_opened == self.time_opened_limit:
-                layer_1.blit(self.close_button_current_image, self.close_button_rect.topleft)
-
         # If it has reached the target y and that y happens to be the fully closed y
         elif self.target_y == self.closed_y:
             if not self.reopenable: # If its one time use only, immediatly remove it from the dropped items
                 glb.engine.rm.current_room_map.dropped_items.remove(self)
 
+    def draw(self, layer_1):
+        # Draw the UI all of the time EXEPT for when its fully closed
+        if self.current_y != self.closed_y:
+            layer_1.blit(self.paper_image, (self.x_pos, self.current_y))
+
+        # When it has been fully opened for long enough show the close button
+        if self.target_y == self.opened_y and self.current_y == self.opened_y and self.time_opened == self.time_opened_limit:
+            layer_1.blit(self.close_button_current_image, self.close_button_rect.topleft)
+
 class FacilityMap(PaperItem):
     def __init__(self):
         super().__init__(424, 160, "assets/crowbr.png", "assets/ui/unused/facility_map.png" if data.DBData.player_name == glb.names[0] else "assets/ui/facility_map.png", None, True)
@@ -1666,8 +1958,8 @@ class FacilityMap(PaperItem):
 
                     if not self.has_opened_map: self.has_opened_map = True
 
-    def draw(self, layer_1):
-        super().draw(layer_1)
+    def update(self):
+        super().update()
 
         if settings.hints:
             if not self.has_opened_map:
@@ -1680,10 +1972,6 @@ class FacilityMap(PaperItem):
             elif self.hint_target_x != self.hint_closed_x:
                 self.hint_target_x = self.hint_closed_x # Close
 
-            # Draw always exept when its closed
-            if self.hint_rect.x != self.hint_closed_x:
-                layer_1.blit(self.hint, self.hint_rect.topleft)
-
             if self.hint_rect.x != self.hint_target_x:
                 dx = self.hint_target_x - self.hint_rect.x
 
@@ -1693,6 +1981,13 @@ class FacilityMap(PaperItem):
                 # When really close, just snap
                 if abs(dx) < 3: self.hint_rect.x = self.hint_target_x
 
+    def draw(self, layer_1):
+        super().draw(layer_1)
+
+        # Draw always exept when its closed
+        if settings.hints and self.hint_rect.x != self.hint_closed_x:
+            layer_1.blit(self.hint, self.hint_rect.topleft)
+
 class TinkerTable(BaseObject):
     # Dictionary of all possible recipes the player can do on the tinker table (needs to be also accessible to RecipesPanel)
     recipes = {}
@@ -2031,6 +2326,7 @@ class LaserMachine(BaseObject):
 
             # Show that the player can enter the new room
             glb.engine.rm.current_room_map.map_image.blit(utils.loadScaledAsset("assets/objects/room_1_active_door.png"), (300 * 4, 218 * 4))
+            glb.engine.invalidate()
 
         self.console = ClickableItem(self.base_x + 16, self.base_y + 144, "", machineRepaired, pygame.transform.rotate(utils.loadScaledAsset("assets/objects/machine_console.png"), -90))
         self.mirror = ClickableItem(self.base_x + 80, self.base_y + 212, "assets/objects/broken_mirror.png", mirrorRepaired)
@@ -2046,6 +2342,11 @@ class LaserMachine(BaseObject):
                 if item.name == "quartz" and index == glb.engine.player.inventory.current_item_idx:
                     self.mirror.input(input_stream)
 
+    def update(self):
+        # The broken laser runs until the timer (started by repairing the machine) runs out
+        if self.broken_laser_timer < 200 and self.broken_laser_timer != 0:
+            self.broken_laser_timer -= 1
+
     def draw(self, layers):
         layers[2].blit(self.console.image, glb.engine.camera.apply(self.console.rect))
         layers[2].blit(self.mirror.image, glb.engine.camera.apply(self.mirror.rect))
@@ -2053,7 +2354,6 @@ class LaserMachine(BaseObject):
         # Blit layers to the second layer
         if self.broken_laser_timer < 200 and self.broken_laser_timer != 0:
             layers[1].blit(self.broken_laser, glb.engine.camera.apply(self.broken_laser_rect))
-            self.broken_laser_timer -= 1
 
         if self.perma_laser_on:
             layers[1].blit(self.perma_laser, glb.engine.camera.apply(self.perma_laser_rect))
@@ -2091,6 +2391,7 @@ class CrystalMachine(BaseObject):
             # Show the door is opened
             current_map = glb.engine.rm.current_room_map
             current_map.map_image.blit(current_map.door, (964, 432))
+            glb.engine.invalidate()
 
             # Turning on the crystal machine was the last thing the player did
             if glb.engine.player.knows_to_fix_machine:
@@ -2219,15 +2520,9 @@ class CrystalMachine(BaseObject):
                     if scrap_name == item.name and index == glb.engine.player.inventory.current_item_idx:
                         self.scrap_place.input(input_stream)
 
-    def draw(self, layers):
-        layers[2].blit(self.console.image,            glb.engine.camera.apply(self.console.rect))
-        layers[2].blit(self.scrap_place.image,        glb.engine.camera.apply(self.scrap_place.rect))
-        layers[2].blit(self.crystals_book.image,      glb.engine.camera.apply(self.crystals_book.rect))
-        layers[2].blit(self.crystal_collection.image, glb.engine.camera.apply(self.crystal_collection.rect)) # Always has to be drawn (so the outline displays)
-
-        self.crystals_book.draw(layers[0]) # Draw to layer_1
-
-        self.scrap_place_close_anim.draw(layers[2], glb.engine.camera.apply(self.scrap_place_close_anim.rect))
+    def update(self):
+        self.crystals_book.update()
+        self.scrap_place_close_anim.update()
 
         # The player can collect the crystal (do the blinking animation)
         if self.current_grown_crystal != "":
@@ -2239,9 +2534,7 @@ class CrystalMachine(BaseObject):
                 # FLip the frame
                 self.crystal_finished_current_frame = 0 if self.crystal_finished_current_frame == 1 else 1
 
-            layers[2].blit(self.crystal_finished_frames[self.crystal_finished_current_frame], glb.engine.camera.apply(self.crystal_collection.rect))
-
-        # Show the throbber
+        # Turn the throbber
         elif len(self.current_scraps) == 2:
             self.crystal_throbber_timer += 1
 
@@ -2254,6 +2547,22 @@ class CrystalMachine(BaseObject):
                 if self.crystal_throbber_current_frame == 4:
                     self.crystal_throbber_current_frame = 0
 
+    def draw(self, layers):
+        layers[2].blit(self.console.image,            glb.engine.camera.apply(self.console.rect))
+        layers[2].blit(self.scrap_place.image,        glb.engine.camera.apply(self.scrap_place.rect))
+        layers[2].blit(self.crystals_book.image,      glb.engine.camera.apply(self.crystals_book.rect))
+        layers[2].blit(self.crystal_collection.image, glb.engine.camera.apply(self.crystal_collection.rect)) # Always has to be drawn (so the outline displays)
+
+        self.crystals_book.draw(layers[0]) # Draw to layer_1
+
+        self.scrap_place_close_anim.draw(layers[2], glb.engine.camera.apply(self.scrap_place_close_anim.rect))
+
+        # The player can collect the crystal (show the blinking animation)
+        if self.current_grown_crystal != "":
+            layers[2].blit(self.crystal_finished_frames[self.crystal_finished_current_frame], glb.engine.camera.apply(self.crystal_collection.rect))
+
+        # Show the throbber
+        elif len(self.current_scraps) == 2:
             layers[2].blit(self.crystal_throbber_frames[self.crystal_throbber_current_frame], glb.engine.camera.apply(self.crystal_collection.rect))
 
         # Scrap indicator lights drawing
@@ -2276,7 +2585,7 @@ class CrystalMachine(BaseObject):
                 case "adamatite": scrap_1_color = (207,  75,  86)
                 case "luminite":  scrap_1_color = ( 69, 167, 119)
 
-            pygame.draw.rect(layers[2], scrap_1_color, glb.engine.camera.apply(self.scrap_1_light_rect))
+            layers[2].drawRect(scrap_1_color, glb.engine.camera.apply(self.scrap_1_light_rect))
 
             if len(self.current_scraps) == 2:
                 scrap_2_color = (0, 0, 0)
@@ -2297,7 +2606,7 @@ class CrystalMachine(BaseObject):
                     case "adamatite": scrap_2_color = (207,  75,  86)
                     case "luminite":  scrap_2_color = ( 69, 167, 119)
 
-                pygame.draw.rect(layers[2], scrap_2_color, glb.engine.camera.apply(self.scrap_2_light_rect))
+                layers[2].drawRect(scrap_2_color, glb.engine.camera.apply(self.scrap_2_light_rect))
 
 class FirstFloorMap(Map):
     def __init__(self):
@@ -1,4 +1,6 @@
 import pygame
+import os
+import settings
 import inputstream
 import dictionaries
 import scene
@@ -6,6 +8,11 @@ import engine
 import soundengine
 import data
 
+# Headless mode uses SDL's dummy drivers, so it runs on machines without a display or a sound card
+if settings.headless:
+    os.environ["SDL_VIDEODRIVER"] = "dummy"
+    os.environ["SDL_AUDIODRIVER"] = "dummy"
+
 db_data = data.DBData()
 
 # Global variables
@@ -16,7 +23,7 @@ clock = pygame.time.Clock()
 input_stream = inputstream.InputStream()
 scene_manager = scene.SceneManager()
 main_menu = scene.MainMenu()
-sound_engine = soundengine.SoundEngine()
+sound_engine = soundengine.SilentSoundEngine() if settings.headless else soundengine.SoundEngine()
 
 names = []
 
@@ -25,5 +32,6 @@ dictionaries.Crystals.loadCrystalTextures()
 dictionaries.Scraps.loadScrapTextures()
 dictionaries.AccessCards.loadCardTextures()
 dictionaries.Tiles.loadTileTextures()
+dictionaries.TextureAtlas.save() # Only does anything if some of the textures werent in the atlas yet
 
 engine = engine.GameEngine()
@@ -1,4 +1,6 @@
 import pygame
+import random
+import struct
 
 class Keyboard:
     def __init__(self):
@@ -9,10 +11,14 @@ class Keyboard:
         self.keys_down = [] # Array of down keys in a given frame
 
     def processInput(self, general_events):
+        self.setState(pygame.key.get_pressed(), [event.key for event in general_events if event.type == pygame.KEYDOWN])
+
+    def setState(self, key_states, keys_down):
+        # Also used by InputReplayer, to feed in recorded input instead of pygame's
         self.previous_key_states = self.current_key_states
-        self.current_key_states = pygame.key.get_pressed()
+        self.current_key_states = key_states
 
-        self.keys_down = [event.key for event in general_events if event.type == pygame.KEYDOWN]
+        self.keys_down = keys_down
 
     def isKeyDown(self, key_code):
         if self.current_key_states is None or self.previous_key_states is None: return False
@@ -34,10 +40,14 @@ class Mouse:
         self.previous_position = (0, 0)
 
     def processInput(self):
+        self.setState(pygame.mouse.get_pressed(), pygame.mouse.get_pos())
+
+    def setState(self, button_states, position):
+        # Also used by InputReplayer, to feed in recorded input instead of pygame's
         self.previous_button_states = self.current_button_states
-        self.current_button_states = pygame.mouse.get_pressed()
+        self.current_button_states = button_states
         self.previous_position = self.current_position
-        self.current_position = pygame.mouse.get_pos()
+        self.current_position = position
 
     # 0 = left button, 1 = middle button, 2 = right button
 
@@ -59,13 +69,143 @@ class Mouse:
     def getDelta(self):
         return (self.current_position[0] - self.previous_position[0], self.current_position[1] - self.previous_position[1])
 
+class InputRecorder:
+    # Writes the input of every step to a file, so the session can be played again exactly the same with InputReplayer
+    # The file starts with the header (magic, version, seed of the random module), then every step is:
+    # - u16 count and u16 scancodes of the keys that changed since the last step
+    # - u8 mouse button bits (left, middle, right)
+    # - i16 mouse x and y movement since the last step
+    # - u8 count and u32 key codes of the KEYDOWN events (for Keyboard.keys_down)
+    # - u8 count and i16 y of the MOUSEWHEEL events
+    # NOTE: The replay only plays out the same if it starts from the same saves (settings.saves_path), bench/replaycheck.py checks that it doesnt depend on the baked rooms
+
+    MAGIC = b"LPIN"
+    VERSION = 1
+    HEADER = "<4sBQ"
+    KEY_COUNT = 512 # Length of pygame.key.get_pressed()
+
+    def __init__(self, path, seed):
+        self.file = open(path, "wb")
+        self.file.write(struct.pack(InputRecorder.HEADER, InputRecorder.MAGIC, InputRecorder.VERSION, seed))
+
+        # The last recorded state, the steps only store what changed
+        self.key_states = (False,) * InputRecorder.KEY_COUNT
+        self.mouse_position = (0, 0)
+
+        random.seed(seed) # Everything random in the game (automatons, sounds, glass boxes) has to happen the same when replaying
+
+    def recordStep(self, input_stream):
+        key_states = tuple(input_stream.keyboard.current_key_states)
+        changed_keys = [scancode for scancode, (down, was_down) in enumerate(zip(key_states, self.key_states)) if down != was_down]
+
+        button_bits = sum(1 << button for button, down in enumerate(input_stream.mouse.current_button_states[:3]) if down)
+
+        position = input_stream.mouse.current_position
+        mouse_dx, mouse_dy = position[0] - self.mouse_position[0], position[1] - self.mouse_position[1]
+
+        keys_down = input_stream.keyboard.keys_down[:255]
+        wheel_ys = [event.y for event in input_stream.general_events if event.type == pygame.MOUSEWHEEL][:255]
+
+        self.file.write(
+            struct.pack(f"<H{len(changed_keys)}H", len(changed_keys), *changed_keys) +
+            struct.pack("<Bhh", button_bits, mouse_dx, mouse_dy) +
+            struct.pack(f"<B{len(keys_down)}I", len(keys_down), *keys_down) +
+            struct.pack(f"<B{len(wheel_ys)}h", len(wheel_ys), *wheel_ys)
+        )
+
+        self.key_states = key_states
+        self.mouse_position = position
+
+    def close(self):
+        self.file.close()
+
+class InputReplayer:
+    # Feeds the input recorded by InputRecorder into the Keyboard and Mouse instead of pygame's, one recorded step per step
+    # When the recording runs out, a QUIT event gets posted so the game closes
+
+    def __init__(self, path):
+        with open(path, "rb") as recording_file: self.data = recording_file.read()
+
+        magic, version, seed = struct.unpack_from(InputRecorder.HEADER, self.data)
+        if magic != InputRecorder.MAGIC or version != InputRecorder.VERSION: raise ValueError(f"\"{path}\" is not a version {InputRecorder.VERSION} input recording")
+
+        self.offset = struct.calcsize(InputRecorder.HEADER)
+        self.finished = False
+
+        self.key_states = [False] * InputRecorder.KEY_COUNT
+        self.mouse_position = (0, 0)
+
+        random.seed(seed) # Same seed as the recording
+
+    def read(self, format):
+        values = struct.unpack_from(format, self.data, self.offset)
+        self.offset += struct.calcsize(format)
+
+        return values
+
+    def replayStep(self, input_stream):
+        button_bits = 0
+        keys_down = []
+        wheel_ys = []
+
+        if self.offset < len(self.data):
+            changed_count, = self.read("<H")
+            for scancode in self.read(f"<{changed_count}H"): self.key_states[scancode] = not self.key_states[scancode]
+
+            button_bits, mouse_dx, mouse_dy = self.read("<Bhh")
+            self.mouse_position = (self.mouse_position[0] + mouse_dx, self.mouse_position[1] + mouse_dy)
+
+            keys_down_count, = self.read("<B")
+            keys_down = list(self.read(f"<{keys_down_count}I"))
+
+            wheel_count, = self.read("<B")
+            wheel_ys = self.read(f"<{wheel_count}h")
+
+        elif not self.finished:
+            self.finished = True
+            self.key_states = [False] * InputRecorder.KEY_COUNT # Let go of everything
+
+            pygame.event.post(pygame.event.Event(pygame.QUIT))
+
+        # The scenes read some events directly, so they get recreated from the recording too
+        input_stream.general_events = [pygame.event.Event(pygame.KEYDOWN, key=key) for key in keys_down] + [pygame.event.Event(pygame.MOUSEWHEEL, x=0, y=y) for y in wheel_ys]
+
+        input_stream.keyboard.setState(pygame.key.ScancodeWrapper(self.key_states), keys_down)
+        input_stream.mouse.setState(tuple(bool(button_bits & (1 << button)) for button in range(3)), self.mouse_position)
+
 class InputStream:
     def __init__(self):
         self.general_events = None
 
         self.keyboard = Keyboard()
         self.mouse = Mouse()
-    
+
+        # Only one of these is set at a time (see startRecording() and startReplay())
+        self.recorder = None
+        self.replayer = None
+
+    def startRecording(self, path, seed=None):
+        if seed is None: seed = random.getrandbits(64)
+
+        self.recorder = InputRecorder(path, seed)
+
+    def startReplay(self, path):
+        self.replayer = InputReplayer(path)
+
+    def stop(self):
+        # Has to be called before the game closes, so the whole recording gets written
+        if self.recorder is not None: self.recorder.close()
+
+        self.recorder = None
+        self.replayer = None
+
     def processInput(self):
+        if self.replayer is not None:
+            self.replayer.replayStep(self)
+
+            return
+
         self.keyboard.processInput(self.general_events)
         self.mouse.processInput()
+
+        if self.recorder is not None: self.recorder.recordStep(self)
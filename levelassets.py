@@ -1,5 +1,8 @@
 from engine import *
 import settings
+import hashlib
+import json
+import os
 
 # Tile objects
 
@@ -24,7 +27,7 @@ class Redirector(TileObject):
         self.active = False # If it is actively redirecting the laser
 
     def activate(self):
-        # Used by drawLaserPath() when the laser hits the Redirector
+        # Used by refreshLaserObjects() when the laser hits the Redirector
         self.active = True
 
         # Update the og and outlined image
@@ -35,7 +38,7 @@ class Redirector(TileObject):
         self.image = self.og_image
 
     def reset(self):
-        # Used by drawLaserPath() when it has to reset all laser-affecting objects
+        # Used by refreshLaserObjects() when the laser no longer hits it
         self.active = False
 
         # Update the og and outlined image
@@ -59,7 +62,7 @@ class Redirector(TileObject):
 
         # Update the direction also on the tilemap, so the laser path can be redirected accordingly
         glb.engine.rm.current_room_map.tilemap[self.tile_pos[1]][self.tile_pos[0]] = self.type
-        glb.engine.rm.current_room_map.drawLaserPath()
+        glb.engine.rm.current_room_map.updateLaserPath(self.tile_pos)
 
         self.refreshOutline()
 
@@ -77,14 +80,14 @@ class Blocker(TileObject):
         self.active = False # If it is actively blocking the laser
 
     def activate(self):
-        # Used by drawLaserPath() when the laser hits the Blocker
+        # Used by refreshLaserObjects() when the laser hits the Blocker
         # Update the og and outlined image
         self.og_image = Tiles.object_tiles[f"BLB_r{ [0, 90, 180, -90][ int(str(self.type)[-1]) ] }"]
 
         self.refreshOutline()
 
     def reset(self):
-        # Used by drawLaserPath() when it has to reset all laser-affecting objects
+        # Used by refreshLaserObjects() when the laser no longer hits it
         # Active needs to remain unchanged
 
         # Update the og and outlined image
@@ -97,7 +100,7 @@ class Blocker(TileObject):
 
         glb.sound_engine.playSound("blocker", 0.8)
 
-        glb.engine.rm.current_room_map.drawLaserPath()
+        glb.engine.rm.current_room_map.updateLaserPath(self.tile_pos)
 
         self.refreshOutline()
 
@@ -118,6 +121,9 @@ class Locker(TileObject):
 
             self.slots.append(InterfaceItem(scrap_name, "", Scraps.dictionary[scrap_name]))
 
+        # Lockers take up two tiles (horizontal when rotated by 0 or 180, vertical otherwise)
+        self.tile_positions = [tile_pos, (tile_pos[0] + 1, tile_pos[1]) if rotation in (0, 180) else (tile_pos[0], tile_pos[1] + 1)]
+
         self.type = type # Can only be 9.0 (blue), 9.1 (green), 9.2 (reward)
         self.opened = False
         self.opened_ui_image = pygame.transform.rotate(utils.loadScaledAsset(f"assets/ui/locker_{ int(str(type)[-1])+1 }_opened.png").convert_alpha(), rotation)
@@ -293,14 +299,14 @@ class Splitter(BaseObject):
         self.active = False # If it is actively splitting the laser
 
     def activate(self):
-        # Used by drawLaserPath() when the laser hits the Splitter
+        # Used by refreshLaserObjects() when the laser hits the Splitter
         self.active = True
 
         # Update the image
         self.image = Tiles.object_tiles[f"SPA_r{ [0, 90, 180, -90][ int(str(self.type)[-1]) ] }"]
 
     def reset(self):
-        # Used by drawLaserPath() when it has to reset all laser-affecting objects
+        # Used by refreshLaserObjects() when the laser no longer hits it
         self.active = False
 
         # Update the image
@@ -329,7 +335,7 @@ class GlassBox(TileObject):
         self.has_ricch = random.randint(1, 5) == 1
 
         if self.has_ricch:
-            self.anim_item = InterfaceItem("ricch", "", pygame.image.load("assets/ui/unused/ricch.png"))
+            self.anim_item = InterfaceItem("ricch", "", utils.displayFormat(pygame.image.load("assets/ui/unused/ricch.png")))
             self.anim_x = scr_x + (self.image.get_width() - self.anim_item.normal_image.get_width()) // 2
 
     def collectLoot(self):
@@ -376,6 +382,27 @@ class GlassBox(TileObject):
 
             layer_1.blit(self.anim_item.normal_image, glb.engine.camera.apply(pygame.Rect(self.anim_x, self.anim_current_y, 64, 64)))
 
+# Laser path
+
+class LaserSegment:
+    # One straight run of the laser, from the tile it starts on (not drawn) to the tile it ends on
+    def __init__(self, start_pos, direction, parent=None):
+        self.start_pos = start_pos # Tile coords (tuple)
+        self.direction = direction
+        self.parent = parent # The segment this one continues from (None for the one coming out of the laser start)
+        self.children = [] # Segments that continue the laser past end_pos (redirected, let through by a blocker or split)
+
+        self.tiles = [] # Tile coords the beam is drawn on
+        self.end_pos = None # Tile coords of whatever stopped the segment
+        self.result = None # What happened at end_pos ("redirect", "pass", "block", "split", "weak reciever", "stop" or "merge")
+        self.merge_state = None # (x, y, direction) where the segment ran into an already traced part of the laser
+
+        self.visited_states = [] # The (x, y, direction) states this segment traced, so they can be freed when it gets removed
+
+        # Map image rects of the drawn beam and laser bit, for clearing them when the segment gets removed
+        self.beam_rect = None
+        self.bit_rect = None
+
 # Main level class
 
 class LevelRoom(Map):
@@ -391,12 +418,20 @@ class LevelRoom(Map):
 
     first_time = True
 
-    def __init__(self, main_tilesheet_path, connections, laser_start, locker_items, glass_box_items=None):
+    baked_maps_path = "cache/rooms"
+    bake_version = "2" # Change this when assembleMap() starts drawing something differently, so old baked maps get ignored
+    max_map_image_size = 4096 * 4096 # Maps with more pixels than this get a ChunkedSurface instead of one big map_image
+    preloaded_maps = {} # Bake key -> (readBakedMap() result, blank map image, blank laser surface), filled in by RoomManager before the room gets created
+    build_in_steps = False # Set by RoomManager while it creates a preloaded room, so the room only gets built by the build steps it runs every frame (see buildSteps())
+    convert_strip_height = 128 # Rows of a preloaded map image that get converted in one build step
+    def __init__(self, main_tilesheet_path, connections, laser_start, locker_items, glass_box_items=None, snapshot=None):
         # General Map class init
-        self.objects = pygame.sprite.Group()
+        self.objects = ObjectGroup()
         self.entities = pygame.sprite.Group()
         self.dropped_items = pygame.sprite.Group()
 
+        self.static_mask = None
+
         # General level stuff
         self.reward_locker_key_dropped = False
         self.reward_locker_key_pos = (0, 0) # This gets updated by the last automaton that died
@@ -408,44 +443,266 @@ class LevelRoom(Map):
         self.tilemap = [] # 2D array
         self.map_margin_x = self.map_margin_y = Tiles.size * 4 # In case the map is too small for the camera (but have a 2 tile margin around the entire map by default)
 
-        self.connections = connections
+        self.connections = dict(connections) # Copied, so a room created again after being evicted starts with its doors locked like the map has them
         # Dictionary of all of the rooms this room connects to. The keys are the room names, and the values are tuples of:
         # - requred access level (0 = entrance connection, -X = unlocked with laser and X access level, all other values are general access card levels)
         # - tile position of the enterance tile
 
         self.laser = laser_start # Dictionary with "start" being a tuple of tile coords, and "direction" being a string
         self.interactable_redirectors = True
+        self.laser_surf = None
 
-        self.assembleMap(main_tilesheet_path)
+        self.snapshot = snapshot # snapshotState() of the room from when RoomManager evicted it, restored by buildSteps()
 
-        # Laser path stuff
-        self.laser_surf = pygame.Surface(self.map_image.get_size(), pygame.SRCALPHA)
-        self.laser_surf_mask = pygame.mask.from_surface(self.laser_surf) # For collision detection with the player
-        self.drawLaserPath()
+        # The rest gets built by buildSteps(), all at once unless RoomManager is preloading the room (then it runs a few steps every frame)
+        self.built = False
+        self.build_steps = self.buildSteps(main_tilesheet_path)
 
-    # Utility function
-    def isFloor(self, i, j):
-        # If the position is off of the tilemap it is automatically not floor
-        if not (0 <= i < len(self.tilemap) and 0 <= j < len(self.tilemap[0])): return False
+        if not LevelRoom.build_in_steps: self.finishBuilding()
 
-        return self.tilemap[i][j] == 1
+    def buildSteps(self, main_tilesheet_path):
+        # Builds the room, yielding between steps that are short enough to fit in a frame
+        yield from self.assembleMap(main_tilesheet_path)
 
-    def drawLaserBranch(self, starting_x, starting_y, direction_1, direction_2):
-        # No need to refresh the laser surface
+        # If the room was evicted earlier, put its objects back the way the player left them (before the laser gets traced through them)
+        snapshot = self.snapshot
+        if snapshot is not None: self.restoreState(snapshot)
 
-        self.laserDrawingLogic(starting_x, starting_y, direction_1)
-        self.laserDrawingLogic(starting_x, starting_y, direction_2)
+        self.snapshot = None # Restored, so from now on only snapshotState() has the state of the room
 
-    def drawLaserPath(self):
-        self.laser_surf.fill((0, 0, 0, 0)) # Refresh the laser surface
-        self.laser_surf_mask.clear() # Refresh the laser surface's mask
+        yield
 
-        # Deactivate ALL Redirectors, Blockers and Splitters (they will get reactivated if supposed to), in case they don't reflect after the update
-        for object in self.objects:
-            if type(object) == Redirector or type(object) == Blocker or type(object) == Splitter:
-                object.reset()
+        # Laser path stuff (preloaded rooms already got a blank laser surface from the preloading thread)
+        if   isinstance(self.map_image, utils.ChunkedSurface): self.laser_surf = utils.ChunkedSurface(self.map_image.get_size(), pygame.SRCALPHA) # Only the chunks the laser goes through get created
+        elif self.laser_surf is None:                          self.laser_surf = pygame.Surface(self.map_image.get_size(), pygame.SRCALPHA)
+        self.laser_surf_mask = pygame.Mask(self.laser_surf.get_size()) # For collision detection with the player (starts empty like the laser surface)
+        self.drawLaserPath(clear=False) # Both are still empty
+
+        # The unlocked connections mostly follow from the laser, but the snapshot has the final say
+        if snapshot is not None: self.connections.update(snapshot["connections"])
+
+        yield
+
+        self.getStaticMask() # Baked now, so the first frame in the room doesnt have to
+
+        self.built = True
+
+    def finishBuilding(self):
+        # Runs the build steps that are left
+        for _ in self.build_steps: pass
+
+    def bakeStaticMask(self, mask):
+        super().bakeStaticMask(mask)
+
+        # Walls, doors and recievers are solid too
+        tile_mask = Tiles.filledMask((Tiles.size, Tiles.size))
+
+        for tile_rect in self.solid_rects.values():
+            mask.draw(tile_mask, tile_rect.topleft)
+
+    def solidTileRects(self, area_rect):
+        # Returns the rects of the solid tiles under the area_rect (in the same top-left to bottom-right order as the tilemap)
+        # The range is padded by one tile on each side so the half pixel map margins can't make it miss a tile
+        first_i = max(0,                     int((area_rect.top    - self.map_margin_y / 2) // Tiles.size) - 1)
+        last_i  = min(len(self.tilemap) - 1, int((area_rect.bottom - self.map_margin_y / 2) // Tiles.size) + 1)
+        first_j = max(0,                     int((area_rect.left   - self.map_margin_x / 2) // Tiles.size) - 1)
+        last_j  = min(len(self.tilemap[0]) - 1, int((area_rect.right  - self.map_margin_x / 2) // Tiles.size) + 1)
+
+        return [self.solid_rects[(i, j)] for i in range(first_i, last_i + 1) for j in range(first_j, last_j + 1) if self.solid_grid[i][j]]
+
+    def objectAt(self, tile_pos):
+        # The object on the tile at tile_pos (x, y), or None if there isnt one
+        return self.objects.tile_index.get(tile_pos)
+
+    def tileAt(self, map_pos):
+        # Tile position (x, y) of the given position on the map image
+        return (int((map_pos[0] - self.map_margin_x / 2) // Tiles.size), int((map_pos[1] - self.map_margin_y / 2) // Tiles.size))
+
+    def tileRect(self, tile_pos):
+        # Map image rect of the tile at tile_pos (x, y)
+        return pygame.Rect(tile_pos[0] * Tiles.size + self.map_margin_x / 2, tile_pos[1] * Tiles.size + self.map_margin_y / 2, Tiles.size, Tiles.size)
+
+    @utils.Profiler.timed
+    def drawLaserPath(self, clear=True):
+        # Fully retraces the laser, only used when the room is created (rotating/toggling objects goes through updateLaserPath())
+        if clear:
+            self.laser_surf.fill((0, 0, 0, 0)) # Refresh the laser surface
+            self.laser_surf_mask.clear() # Refresh the laser surface's mask
+
+        self.laser_segments = [] # Every segment of the current laser path, in the order they were drawn
+        self.laser_segment_ends = {} # Tile position -> segments that end on that tile
+        self.laser_visited = {} # (x, y, direction) -> the segment that traced the laser through that tile in that direction
+        self.laser_tiles_traced = 0 # How many tiles the last drawLaserPath()/updateLaserPath() had to trace (for profiling)
+
+        self.traceLaserPath([LaserSegment(self.laser["start"], self.laser["direction"])])
+        self.redrawLaserTiles()
+
+        if utils.Profiler.enabled: utils.Profiler.count("laser tiles traced", self.laser_tiles_traced)
+
+        # Deactivate/reactivate ALL Redirectors, Blockers and Splitters depending on the new path
+        self.refreshLaserObjects()
+        self.refreshWeakRecievers()
+
+    @utils.Profiler.timed
+    def updateLaserPath(self, tile_pos):
+        # Used when the object at tile_pos changes (rotated redirector, toggled blocker)
+        # Only the segments ending on tile_pos and everything after them gets retraced, the rest of the laser stays as it is
+        affected_segments = self.laser_segment_ends.get(tile_pos, [])
+        dirty_rects = [] # Parts of the laser surface that have to be cleared
+        touched_tiles = {tile_pos} # Tiles whose objects might have to change state
+        self.laser_tiles_traced = 0
+
+        for segment in affected_segments:
+            # The beam leading up to tile_pos is still the same, only what happens at tile_pos (and after) changes
+            self.removeLaserSegments(segment.children, dirty_rects, touched_tiles)
+
+            segment.children = []
+
+            if segment.bit_rect:
+                dirty_rects.append(segment.bit_rect)
+                segment.bit_rect = None
+
+        # Segments that stopped because a removed segment was already there have to continue on their own now
+        resumed_segments = [segment for segment in self.laser_segments if segment.merge_state is not None and segment.merge_state not in self.laser_visited]
+
+        # Clear the removed segments from the mask (the laser surface gets cleared by redrawLaserTiles() after the retrace)
+        for rect in dirty_rects:
+            self.laser_surf_mask.erase(Tiles.filledMask(rect.size), rect.topleft)
+
+        # Retrace from the changed tile onwards
+        new_segments = []
+
+        for segment in affected_segments:
+            self.endLaserSegment(segment)
+            new_segments.extend(segment.children)
+
+        traced_segments = self.traceLaserPath(new_segments + resumed_segments)
+
+        # Redraw every tile that lost a part of the laser or got a new one, so the surviving segments show up there again and overlapping parts are in the same order as after drawLaserPath()
+        redraw_rects = dirty_rects + [rect for segment in traced_segments for rect in (segment.beam_rect, segment.bit_rect) if rect]
+        self.redrawLaserTiles({tile_pos for rect in redraw_rects for tile_pos in self.tilesUnder(rect)})
+
+        # The objects that the new segments end on might have to change state too
+        touched_tiles.update(segment.end_pos for segment in traced_segments if segment.end_pos is not None)
+
+        self.refreshLaserObjects(touched_tiles)
+        self.refreshWeakRecievers()
+
+        if utils.Profiler.enabled: utils.Profiler.count("laser tiles traced", self.laser_tiles_traced)
+
+        glb.engine.invalidate() # The laser surface and the map image changed in place
+
+    def removeLaserSegments(self, segments, dirty_rects, touched_tiles):
+        # Removes the segments and all of the segments after them from the laser path
+        stack = list(segments)
+
+        while stack:
+            segment = stack.pop()
+            stack.extend(segment.children)
+
+            self.laser_segments.remove(segment)
+
+            for state in segment.visited_states:
+                del self.laser_visited[state]
+
+            if segment.end_pos is not None:
+                self.laser_segment_ends[segment.end_pos].remove(segment)
+                touched_tiles.add(segment.end_pos)
+
+            if segment.beam_rect: dirty_rects.append(segment.beam_rect)
+            if segment.bit_rect:  dirty_rects.append(segment.bit_rect)
+
+    def refreshLaserObjects(self, tile_positions=None):
+        # Sets the state of the Redirectors, Blockers and Splitters (on tile_positions, or all if None) depending on the segments that end on them
+        for object in self.objects if tile_positions is None else [self.objectAt(tile_pos) for tile_pos in tile_positions]:
+            if type(object) != Redirector and type(object) != Blocker and type(object) != Splitter: continue
+
+            results = [segment.result for segment in self.laser_segment_ends.get(object.tile_pos, [])]
+
+            if   type(object) == Redirector: object.activate() if "redirect" in results else object.reset()
+            elif type(object) == Blocker:    object.activate() if "block"    in results else object.reset()
+            elif type(object) == Splitter:   object.activate() if "split"    in results else object.reset()
+
+        # The laser has reached the reciever, set all redirectors to active and all blockers to inactive
+        if not self.interactable_redirectors:
+            for object in self.objects:
+                if type(object) == Redirector:
+                    object.activate()
+                    object.image = object.og_image
+
+                elif type(object) == Blocker:
+                    object.reset()
+
+    def refreshWeakRecievers(self):
+        # Update the weak laser recievers and the secondary doors connected to them (regular recievers dont need this because they only get activated once)
+        # Only the ones whose state actually changed since the last trace get re-blitted
+        active_recievers = [segment.end_pos for segment in self.laser_segments if segment.result == "weak reciever"]
+
+        for reciever_pos, active in self.weak_reciever_states.items():
+            if (reciever_pos in active_recievers) == active: continue
+
+            self.weak_reciever_states[reciever_pos] = reciever_pos in active_recievers
+
+            rotation = self.facing_rotations[reciever_pos]
+            if rotation is not None:
+                self.map_image.blit(Tiles.wall_tiles[f"WR{'A' if reciever_pos in active_recievers else 'C'}_{rotation}"], self.tileRect(reciever_pos))
 
-        self.laserDrawingLogic(self.laser["start"][0], self.laser["start"][1], self.laser["direction"])
+        # Every active weak reciever unlocks one secondary connection
+        for room_name, reciever_pos in self.secondary_door_states.items():
+            new_reciever_pos = active_recievers.pop(0) if active_recievers else None
+
+            if new_reciever_pos == reciever_pos: continue
+
+            self.secondary_door_states[room_name] = new_reciever_pos
+
+            room_access, connection_tile_pos = self.connections[room_name]
+
+            if new_reciever_pos is not None:
+                self.connections[room_name] = (abs(room_access), connection_tile_pos) # Flip the number so now only the access card level is required
+
+                # Change the adjacent door texture to indicate that it can be accessed now (facing the same way as the reciever)
+                rotation = self.facing_rotations[new_reciever_pos]
+                if rotation is not None: self.map_image.blit(Tiles.wall_tiles[f"WDA_{rotation}"], self.tileRect(connection_tile_pos))
+
+            else:
+                self.connections[room_name] = (-abs(room_access), connection_tile_pos) # Flip the number so its back to the original
+
+                # Reset the texture
+                rotation = self.facing_rotations.get(connection_tile_pos)
+                if rotation is not None: self.map_image.blit(Tiles.wall_tiles[f"WDO_{rotation}"], self.tileRect(connection_tile_pos))
+
+    def tilesUnder(self, map_rect):
+        # Tile positions (x, y) of every tile the map image rect touches
+        first_x, first_y = self.tileAt(map_rect.topleft)
+        last_x, last_y = self.tileAt((map_rect.right - 1, map_rect.bottom - 1))
+
+        return [(x, y) for y in range(first_y, last_y + 1) for x in range(first_x, last_x + 1)]
+
+    def redrawLaserTiles(self, tile_positions=None):
+        # Clears the given tiles of the laser surface (or every tile with more than one part of the laser on it if None) and draws the laser on them again
+        # The laser images are semi transparent, so where parts of the laser overlap, the tile depends on the order they were drawn in
+        # updateLaserPath() traces in a different order than drawLaserPath(), so overlapping parts always get drawn in the same (sorted) order here
+        parts = {} # Tile position -> (0 for a beam or 1 for a laser bit, direction) of every part of the laser on it
+
+        for segment in self.laser_segments:
+            for tile_pos in segment.tiles: parts.setdefault(tile_pos, []).append((0, segment.direction))
+            if segment.bit_rect: parts.setdefault(segment.end_pos, []).append((1, segment.direction))
+
+        if tile_positions is None: tile_positions = [tile_pos for tile_pos, tile_parts in parts.items() if len(tile_parts) > 1]
+
+        for tile_pos in tile_positions:
+            tile_rect = self.tileRect(tile_pos)
+            self.laser_surf.fill((0, 0, 0, 0), tile_rect)
+
+            for is_bit, direction in sorted(parts.get(tile_pos, [])):
+                if is_bit:
+                    self.fillLaserBit(direction, tile_pos)
+                    continue
+
+                horizontal = direction == 'left' or direction == 'right'
+
+                self.laser_surf.blit(Tiles.other_tiles[f"LAS_r{0 if horizontal else 90}"], tile_rect.topleft)
+                self.laser_surf_mask.draw(Tiles.laserBeamMask(horizontal, 1), (tile_rect.x + (0 if horizontal else 24), tile_rect.y + (24 if horizontal else 0)))
 
     def fillLaserBit(self, direction, tile_pos):
         # This function adds an additional pixel of laser to objects that are smaller than their image (a lot of them)
@@ -459,286 +716,290 @@ class LevelRoom(Map):
             case "left":  bit_x, bit_y = accurate_x - 4 + Tiles.size, accurate_y
             case "right": bit_x, bit_y = accurate_x, accurate_y
 
-        self.laser_surf.blit(Tiles.other_tiles[f"LSB_r{0 if direction == 'left' or direction == 'right' else 90}"], (bit_x, bit_y))
+        laser_bit_image = Tiles.other_tiles[f"LSB_r{0 if direction == 'left' or direction == 'right' else 90}"]
 
-    def laserDrawingLogic(self, current_x, current_y, direction):
-        # Reset all of the weak laser recievers and the doors connected to them (regular recievers dont need this because they only get activated once)
-        for i, row in enumerate(self.tilemap):
-            for j, tile in enumerate(row):
-                x = j * Tiles.size + self.map_margin_x / 2
-                y = i * Tiles.size + self.map_margin_y / 2
+        self.laser_surf.blit(laser_bit_image, (bit_x, bit_y))
 
-                if tile == 6:
-                    # Reset the weak reciever tile
-                    if   self.isFloor(i+1, j): self.map_image.blit(Tiles.wall_tiles["WRC_r0"],   (x, y)) # Top
-                    elif self.isFloor(i, j+1): self.map_image.blit(Tiles.wall_tiles["WRC_r90"],  (x, y)) # Left
-                    elif self.isFloor(i-1, j): self.map_image.blit(Tiles.wall_tiles["WRC_r180"], (x, y)) # Bottom
-                    elif self.isFloor(i, j-1): self.map_image.blit(Tiles.wall_tiles["WRC_r-90"], (x, y)) # Right
+        # Return the full rect even if the laser surface is clipped, so it can be cleared later
+        return pygame.Rect((bit_x, bit_y), laser_bit_image.get_size())
 
-        # Find all secondary connections that get unlocked via a weak laser and reset them
-        for room_name, (room_access, connection_tile_pos) in self.connections.items():
-            if room_name[-2] == "_" and room_name[-1] == "5": # Check if it is a secondary room
-                self.connections[room_name] = (-abs(room_access), connection_tile_pos) # Flip the number so its back to the original
+    def drawLaserSegment(self, segment, tiles=None):
+        # Draws the beam of the segment (or only the given tiles of it) and its laser bit (if it has one)
+        tiles = segment.tiles if tiles is None else tiles
+        horizontal = segment.direction == 'left' or segment.direction == 'right'
 
-                # Change the adjacent door texture to indicate that it can be accessed now
-                door_x = connection_tile_pos[0] * Tiles.size + self.map_margin_x / 2
-                door_y = connection_tile_pos[1] * Tiles.size + self.map_margin_y / 2
+        for current_x, current_y in tiles:
+            self.laser_surf.blit(Tiles.other_tiles[f"LAS_r{0 if horizontal else 90}"], (
+                current_x * Tiles.size + self.map_margin_x / 2,
+                current_y * Tiles.size + self.map_margin_y / 2
+            ))
+
+        # Also draw a laser mask on to the actual laser_surf_mask for the player's collision detection (one mask for the whole straight run)
+        if tiles:
+            run_rect = self.tileRect(tiles[0]).union(self.tileRect(tiles[-1]))
+
+            self.laser_surf_mask.draw(Tiles.laserBeamMask(horizontal, len(tiles)), (run_rect.x + (0 if horizontal else 24), run_rect.y + (24 if horizontal else 0)))
+
+        if segment.tiles: segment.beam_rect = self.tileRect(segment.tiles[0]).union(self.tileRect(segment.tiles[-1]))
+
+        if segment.bit_rect: self.fillLaserBit(segment.direction, segment.end_pos)
+
+    def traceLaserPath(self, segments):
+        # Traces the segments and every segment that continues from them, returns all of the segments that were traced
+        # Uses a stack instead of recursion, and every tile is traced at most once per direction (laser_visited)
+        # So even if the laser loops back on itself this always ends, after at most 4 * (amount of tiles) steps
+        stack = list(reversed(segments))
+        traced_segments = []
+
+        while stack:
+            segment = stack.pop()
+
+            self.traceLaserSegment(segment)
+            traced_segments.append(segment)
+
+            # Reversed so the first branch gets traced (and drawn) first
+            stack.extend(reversed(segment.children))
+
+        return traced_segments
+
+    def traceLaserSegment(self, segment):
+        # Convert the direction to coord steps
+        match segment.direction:
+            case "up":    x_direction_step, y_direction_step = (0, -1) # X stays the same, Y changes by -1 (goes up)
+            case "down":  x_direction_step, y_direction_step = (0,  1) # X stays the same, Y changes by +1 (goes down)
+            case "left":  x_direction_step, y_direction_step = (-1, 0) # X changes by -1 (goes left), Y stays the same
+            case "right": x_direction_step, y_direction_step = (1,  0) # X changes by +1 (goes right), Y stays the same
+
+        if segment.merge_state is not None:
+            # The segment stopped where the laser was already traced before, but that part got removed, so continue from there
+            current_x, current_y = segment.merge_state[0], segment.merge_state[1]
+            new_tiles_start = len(segment.tiles) # Only the new part of the beam needs to be drawn
+
+            segment.merge_state = segment.result = None
+
+        else:
+            # Move one step in the current direction so the tile the segment starts from isnt checked again (it has already been handled by the previous segment)
+            current_x = segment.start_pos[0] + x_direction_step
+            current_y = segment.start_pos[1] + y_direction_step
+
+            new_tiles_start = 0
+
+            self.laser_segments.append(segment)
+
+        # Keep stepping in the current direction until the laser hits something that isnt floor
+        while 0 <= current_x < len(self.tilemap[0]) and 0 <= current_y < len(self.tilemap):
+            state = (current_x, current_y, segment.direction)
+
+            # The laser has already been traced from here in the same direction, so everything after this is already drawn
+            if state in self.laser_visited:
+                segment.merge_state = state
+                segment.result = "merge"
+                break
+
+            self.laser_visited[state] = segment
+            segment.visited_states.append(state)
+            self.laser_tiles_traced += 1
+
+            tile = self.tilemap[current_y][current_x]
+
+            # Walls, doors, redirectors, recievers, blockers, splitters and glass boxes all end the segment
+            if tile in (2, 3, 5, 6, 11) or 4.0 <= tile <= 4.3 or 7.0 <= tile <= 7.3 or 8.0 <= tile <= 8.3:
+                segment.end_pos = (current_x, current_y)
+                break
+
+            segment.tiles.append((current_x, current_y))
 
-                # Reset the texture
-                if   self.isFloor(connection_tile_pos[1]+1, connection_tile_pos[0]): self.map_image.blit(Tiles.wall_tiles["WDO_r0"],   (door_x, door_y)) # Top
-                elif self.isFloor(connection_tile_pos[1], connection_tile_pos[0]+1): self.map_image.blit(Tiles.wall_tiles["WDO_r90"],  (door_x, door_y)) # Left
-                elif self.isFloor(connection_tile_pos[1]-1, connection_tile_pos[0]): self.map_image.blit(Tiles.wall_tiles["WDO_r180"], (door_x, door_y)) # Bottom
-                elif self.isFloor(connection_tile_pos[1], connection_tile_pos[0]-1): self.map_image.blit(Tiles.wall_tiles["WDO_r-90"], (door_x, door_y)) # Right
-
-        # Repeat drawing the laser path until the laser hits a wall, an incorrect redirector, an active blocker or an incorrect splitter
-        while True:
-            # Convert the current direction to coord steps
-            match direction:
-                case "up":    x_direction_step, y_direction_step = (0, -1) # X stays the same, Y changes by -1 (goes up)
-                case "down":  x_direction_step, y_direction_step = (0,  1) # X stays the same, Y changes by +1 (goes down)
-                case "left":  x_direction_step, y_direction_step = (-1, 0) # X changes by -1 (goes left), Y stays the same
-                case "right": x_direction_step, y_direction_step = (1,  0) # X changes by +1 (goes right), Y stays the same
-
-            # This part of the while loop gets activated once the direction has been changed
-            # So move one step in the current direction so the redirector isnt checked again below (since it has already redirected the laser last iteration)
             current_x += x_direction_step
             current_y += y_direction_step
 
-            # Keep stepping in the current direction until a wall or a redirector is hit
-            while 0 <= current_x < len(self.tilemap[0]) and 0 <= current_y < len(self.tilemap):
-                tile = self.tilemap[current_y][current_x]
+        self.drawLaserSegment(segment, segment.tiles[new_tiles_start:])
 
-                # If the laser hits a wall tile or a door tile, exit the entire function
-                if tile == 3 or tile == 2: return
+        if segment.end_pos is not None:
+            self.laser_segment_ends.setdefault(segment.end_pos, []).append(segment)
+            self.endLaserSegment(segment)
 
-                # Check if the current tile is a redirector tile (4.0, 4.1, 4.2, 4.3)
-                if 4.0 <= tile <= 4.3:
-                    # Check if the current redirector can redirect the laser, if so, change the direction and break out of the inner while loop
-                    match (direction, tile):
-                        # Up-Left redirector (4.0) can redirect a laser thats traveling right or downwards
-                        case ("right", 4.0): direction = "up"
-                        case ("down",  4.0): direction = "left"
+    def endLaserSegment(self, segment):
+        # Handles whatever the segment hit at its end_pos and creates the segments that continue the laser from there (traced by traceLaserPath())
+        current_x, current_y = segment.end_pos
+        direction = segment.direction
+        tile = self.tilemap[current_y][current_x]
 
-                        # Down-Left redirector (4.1) can redirect a laser thats traveling right or upwards
-                        case ("right", 4.1): direction = "down"
-                        case ("up",    4.1): direction = "left"
+        segment.result = "stop" # Walls, doors and everything that doesnt let the laser through
 
-                        # Down-Right redirector (4.2) can redirect a laser thats traveling left or upwards
-                        case ("left",  4.2): direction = "down"
-                        case ("up",    4.2): direction = "right"
+        # Check if the current tile is a redirector tile (4.0, 4.1, 4.2, 4.3)
+        if 4.0 <= tile <= 4.3:
+            # Check if the current redirector can redirect the laser, if so, continue the laser in the new direction
+            match (direction, tile):
+                # Up-Left redirector (4.0) can redirect a laser thats traveling right or downwards
+                case ("right", 4.0): direction = "up"
+                case ("down",  4.0): direction = "left"
 
-                        # Up-Right redirector (4.3) can redirect a laser thats traveling left or downwards
-                        case ("left",  4.3): direction = "up"
-                        case ("down",  4.3): direction = "right"
+                # Down-Left redirector (4.1) can redirect a laser thats traveling right or upwards
+                case ("right", 4.1): direction = "down"
+                case ("up",    4.1): direction = "left"
 
-                        # If the current laser direction and redirector type arent compatible (redirector cant redirect), exit the function
-                        case _:
-                            self.fillLaserBit(direction, (current_x, current_y))
+                # Down-Right redirector (4.2) can redirect a laser thats traveling left or upwards
+                case ("left",  4.2): direction = "down"
+                case ("up",    4.2): direction = "right"
 
-                            return
+                # Up-Right redirector (4.3) can redirect a laser thats traveling left or downwards
+                case ("left",  4.3): direction = "up"
+                case ("down",  4.3): direction = "right"
 
-                    # If the "case _: return" hasn't activated (the redirector is redirecting), change the current redirector's image to an active one
-                    for object in self.objects:
-                        if object.tile_pos == (current_x, current_y) and not object.active: # Just in case its not already active
-                            object.activate() # No need to check for type because tile_pos takes care of that
-                            break
+                # If the current laser direction and redirector type arent compatible (redirector cant redirect), stop the laser
+                case _:
+                    segment.bit_rect = self.fillLaserBit(direction, (current_x, current_y))
+
+            if segment.bit_rect is None:
+                segment.result = "redirect"
+                segment.children.append(LaserSegment((current_x, current_y), direction, segment))
+
+        # If the laser hits the reciever, unlock the only entrance that is locked with it and activate the reciever
+        elif tile == 5:
+            # Find the connection that gets unlocked via laser
+            for room_name, (room_access, connection_tile_pos) in self.connections.items():
+                if (room_access < 0 and # If the access can be flipped AND if its adjacent to the current tile
+                    current_x-1 <= connection_tile_pos[0] <= current_x+1 and
+                    current_y-1 <= connection_tile_pos[1] <= current_y+1
+                    ):
+                    self.connections[room_name] = (-room_access, connection_tile_pos) # Flip the number so now only the access card level is required
+
+                    # Change the adjacent door texture to indicate that it can be accessed now (facing the same way as the reciever)
+                    door_x = connection_tile_pos[0] * Tiles.size + self.map_margin_x / 2
+                    door_y = connection_tile_pos[1] * Tiles.size + self.map_margin_y / 2
+
+                    rotation = self.facing_rotations[(current_x, current_y)]
+                    if rotation: self.map_image.blit(Tiles.wall_tiles[f"WDA_{rotation}"], (door_x, door_y))
 
                     break
 
-                # If the laser hits the reciever, unlock the only entrance that is locked with it and activate the reciever, and exit the entire function
-                if tile == 5:
-                    # Find the connection that gets unlocked via laser
-                    for room_name, (room_access, connection_tile_pos) in self.connections.items():
-                        if (room_access < 0 and # If the access can be flipped AND if its adjacent to the current tile
-                            current_x-1 <= connection_tile_pos[0] <= current_x+1 and
-                            current_y-1 <= connection_tile_pos[1] <= current_y+1
-                            ):
-                            self.connections[room_name] = (-room_access, connection_tile_pos) # Flip the number so now only the access card level is required
-
-                            # Change the adjacent door texture to indicate that it can be accessed now
-                            door_x = connection_tile_pos[0] * Tiles.size + self.map_margin_x / 2
-                            door_y = connection_tile_pos[1] * Tiles.size + self.map_margin_y / 2
-
-                            if   self.isFloor(current_y+1, current_x): self.map_image.blit(Tiles.wall_tiles["WDA_r0"],   (door_x, door_y)) # Top
-                            elif self.isFloor(current_y, current_x+1): self.map_image.blit(Tiles.wall_tiles["WDA_r90"],  (door_x, door_y)) # Left
-                            elif self.isFloor(current_y-1, current_x): self.map_image.blit(Tiles.wall_tiles["WDA_r180"], (door_x, door_y)) # Bottom
-                            elif self.isFloor(current_y, current_x-1): self.map_image.blit(Tiles.wall_tiles["WDA_r-90"], (door_x, door_y)) # Right
-
-                            break
-
-                    x = current_x * Tiles.size + self.map_margin_x / 2
-                    y = current_y * Tiles.size + self.map_margin_y / 2
-
-                    # Activate the reciever tile
-                    if   self.isFloor(current_y+1, current_x): self.map_image.blit(Tiles.wall_tiles["RAC_r0"],   (x, y)) # Top
-                    elif self.isFloor(current_y, current_x+1): self.map_image.blit(Tiles.wall_tiles["RAC_r90"],  (x, y)) # Left
-                    elif self.isFloor(current_y-1, current_x): self.map_image.blit(Tiles.wall_tiles["RAC_r180"], (x, y)) # Bottom
-                    elif self.isFloor(current_y, current_x-1): self.map_image.blit(Tiles.wall_tiles["RAC_r-90"], (x, y)) # Right
-
-                    self.interactable_redirectors = False # The laser has reached its goal, so the redirectors can no longer be interacted with
-
-                    glb.sound_engine.playSound("reciever", 1)
-
-                    glb.engine.score += 100
-
-                    # Set all redirectors to active and all blockers to inactive
-                    for object in self.objects:
-                        if type(object) == Redirector:
-                            object.activate()
-                            object.image = object.og_image
-
-                        elif type(object) == Blocker:
-                            object.reset()
-
-                    return
-
-                # Check if the current tile is a weak reciever tile
-                if tile == 6:
-                    # Find the connection that gets unlocked via a weak laser
-                    for room_name, (room_access, connection_tile_pos) in self.connections.items():
-                        if room_access < 0 and room_name[-2] == "_" and room_name[-1] == "5": # Additionally check if it is a secondary room
-                            self.connections[room_name] = (-room_access, connection_tile_pos) # Flip the number so now only the access card level is required
-
-                            # Change the adjacent door texture to indicate that it can be accessed now
-                            door_x = connection_tile_pos[0] * Tiles.size + self.map_margin_x / 2
-                            door_y = connection_tile_pos[1] * Tiles.size + self.map_margin_y / 2
-
-                            if   self.isFloor(current_y+1, current_x): self.map_image.blit(Tiles.wall_tiles["WDA_r0"],   (door_x, door_y)) # Top
-                            elif self.isFloor(current_y, current_x+1): self.map_image.blit(Tiles.wall_tiles["WDA_r90"],  (door_x, door_y)) # Left
-                            elif self.isFloor(current_y-1, current_x): self.map_image.blit(Tiles.wall_tiles["WDA_r180"], (door_x, door_y)) # Bottom
-                            elif self.isFloor(current_y, current_x-1): self.map_image.blit(Tiles.wall_tiles["WDA_r-90"], (door_x, door_y)) # Right
-
-                            break
-
-                    x = current_x * Tiles.size + self.map_margin_x / 2
-                    y = current_y * Tiles.size + self.map_margin_y / 2
-
-                    # Activate the weak reciever tile
-                    if   self.isFloor(current_y+1, current_x): self.map_image.blit(Tiles.wall_tiles["WRA_r0"],   (x, y)) # Top
-                    elif self.isFloor(current_y, current_x+1): self.map_image.blit(Tiles.wall_tiles["WRA_r90"],  (x, y)) # Left
-                    elif self.isFloor(current_y-1, current_x): self.map_image.blit(Tiles.wall_tiles["WRA_r180"], (x, y)) # Bottom
-                    elif self.isFloor(current_y, current_x-1): self.map_image.blit(Tiles.wall_tiles["WRA_r-90"], (x, y)) # Right
-
-                    return
-
-                # Check if the current tile is a blocker tile (7.0, 7.1, 7.2, 7.3)
-                if 7.0 <= tile <= 7.3:
-                    # Find the current blocker object
-                    for object in self.objects:
-                        if object.tile_pos == (current_x, current_y):
-                            # Check if the blocker direction and laser direction oppose
-                            if ((tile == 7.0 and direction == "down") or
-                                (tile == 7.1 and direction == "right") or
-                                (tile == 7.2 and direction == "up") or
-                                (tile == 7.3 and direction == "left")):
-
-                                # If the blocker is actively blocking, update its texture and exit the entire function
-                                if object.active:
-                                    object.activate()
-                                    return
-
-                                break # If the blocker is not actively blocking, break out of the inner while loop so the laser can continue
-
-                            # The blocker is facing the wrong direction
-                            else:
-                                self.fillLaserBit(direction, (current_x, current_y))
-
-                                return
-
-                # Check if the current tile is a splitter tile (8.0, 8.1, 8.2, 8.3)
-                if 8.0 <= tile <= 8.3:
-                    # Figure out the two new branches
-                    match tile:
-                        case 8.0:
-                            match direction:
-                                case "up":    self.drawLaserBranch(current_x, current_y, "left", "up")
-                                case "down":  self.drawLaserBranch(current_x, current_y, "left", "down")
-                                case "left": 
-                                    self.fillLaserBit(direction, (current_x, current_y))
-                                    return # Dont make any new branches because the laser is hitting the wrong side
-                                case "right": self.drawLaserBranch(current_x, current_y, "up", "down")
-
-                        case 8.1:
-                            match direction:
-                                case "up":    self.drawLaserBranch(current_x, current_y, "left", "right")
-                                case "down": 
-                                    self.fillLaserBit(direction, (current_x, current_y))
-                                    return # Dont make any new branches because the laser is hitting the wrong side
-                                case "left":  self.drawLaserBranch(current_x, current_y, "left", "down")
-                                case "right": self.drawLaserBranch(current_x, current_y, "right", "down")
-
-                        case 8.2:
-                            match direction:
-                                case "up":    self.drawLaserBranch(current_x, current_y, "up", "right")
-                                case "down":  self.drawLaserBranch(current_x, current_y, "down", "right")
-                                case "left":  self.drawLaserBranch(current_x, current_y, "up", "down")
-                                case "right": 
-                                    self.fillLaserBit(direction, (current_x, current_y))
-                                    return # Dont make any new branches because the laser is hitting the wrong side
-
-                        case 8.3:
-                            match direction:
-                                case "up": 
-                                    self.fillLaserBit(direction, (current_x, current_y))
-                                    return # Dont make any new branches because the laser is hitting the wrong side
-                                case "down":  self.drawLaserBranch(current_x, current_y, "left", "right")
-                                case "left":  self.drawLaserBranch(current_x, current_y, "left", "up")
-                                case "right": self.drawLaserBranch(current_x, current_y, "right", "up")
-
-                    # Change the current splitter's image to an active one
-                    for object in self.objects:
-                        if object.tile_pos == (current_x, current_y) and not object.active: # Just in case its not already active
-                            object.activate() # No need to check for type because tile_pos takes care of that
-                            break
-
-                    # The laser will continue in the form of two new branches (or not in certain cases)
-                    return
-
-                # If the laser hits a glass box, unlock it and stop the laser
-                if tile == 11:
-                    # Change the current splitter's image to an active one
-                    for object in self.objects:
-                        if object.tile_pos == (current_x, current_y) and not object.unlocked: # Just in case its not already unlocked
-                            object.unlock() # No need to check for type because tile_pos takes care of that
-                            break
-
-                    self.fillLaserBit(direction, (current_x, current_y))
-
-                    return
-
-                # The if statements above always break the loop if True (either with break or return)
-                # So if the current tile is NOT a redirector tile nor a wall, draw the laser and move a step further in the same direction
-                self.laser_surf.blit(Tiles.other_tiles[f"LAS_r{0 if direction == 'left' or direction == 'right' else 90}"], (
-                    current_x * Tiles.size + self.map_margin_x / 2,
-                    current_y * Tiles.size + self.map_margin_y / 2
-                ))
-
-                # Also draw a laser mask on to the actual laser_surf_mask for the player's collision detection
-                laser_beam_mask_x = 24 if direction == 'up' or direction == 'down' else 0
-                laser_beam_mask_y = 24 if direction == 'left' or direction == 'right' else 0
-
-                self.laser_surf_mask.draw( # The size of the laser beam scaled up
-                    pygame.Mask((18 * 4, 6 * 4) if direction == 'left' or direction == 'right' else (6 * 4, 18 * 4), fill=True), 
-                    (
-                        current_x * Tiles.size + self.map_margin_x / 2 + laser_beam_mask_x,
-                        current_y * Tiles.size + self.map_margin_y / 2 + laser_beam_mask_y
-                    )
-                )
+            x = current_x * Tiles.size + self.map_margin_x / 2
+            y = current_y * Tiles.size + self.map_margin_y / 2
 
-                current_x += x_direction_step
-                current_y += y_direction_step
+            # Activate the reciever tile
+            rotation = self.facing_rotations[(current_x, current_y)]
+            if rotation: self.map_image.blit(Tiles.wall_tiles[f"RAC_{rotation}"], (x, y))
+
+            # Only reward it the first time (restored rooms hit the reciever again when their laser gets traced)
+            if self.interactable_redirectors:
+                glb.sound_engine.playSound("reciever", 1)
+
+                glb.engine.score += 100
+
+            self.interactable_redirectors = False # The laser has reached its goal, so the redirectors can no longer be interacted with
+
+        # Weak recievers get activated by refreshWeakRecievers() once the whole path is traced
+        elif tile == 6:
+            segment.result = "weak reciever"
+
+        # Check if the current tile is a blocker tile (7.0, 7.1, 7.2, 7.3)
+        elif 7.0 <= tile <= 7.3:
+            # Check if the blocker direction and laser direction oppose
+            if ((tile == 7.0 and direction == "down") or
+                (tile == 7.1 and direction == "right") or
+                (tile == 7.2 and direction == "up") or
+                (tile == 7.3 and direction == "left")):
+
+                # If the blocker is actively blocking, stop the laser, otherwise let it continue
+                if self.objectAt((current_x, current_y)).active:
+                    segment.result = "block"
+
+                else:
+                    segment.result = "pass"
+                    segment.children.append(LaserSegment((current_x, current_y), direction, segment))
+                    segment.children[-1].tiles.append((current_x, current_y)) # The laser gets drawn over inactive blockers
+
+            # The blocker is facing the wrong direction
+            else:
+                segment.bit_rect = self.fillLaserBit(direction, (current_x, current_y))
+
+        # Check if the current tile is a splitter tile (8.0, 8.1, 8.2, 8.3)
+        elif 8.0 <= tile <= 8.3:
+            # Figure out the two new branches (None if the laser is hitting the wrong side)
+            match (tile, direction):
+                case (8.0, "up"):    branches = ("left", "up")
+                case (8.0, "down"):  branches = ("left", "down")
+                case (8.0, "right"): branches = ("up", "down")
+
+                case (8.1, "up"):    branches = ("left", "right")
+                case (8.1, "left"):  branches = ("left", "down")
+                case (8.1, "right"): branches = ("right", "down")
+
+                case (8.2, "up"):    branches = ("up", "right")
+                case (8.2, "down"):  branches = ("down", "right")
+                case (8.2, "left"):  branches = ("up", "down")
+
+                case (8.3, "down"):  branches = ("left", "right")
+                case (8.3, "left"):  branches = ("left", "up")
+                case (8.3, "right"): branches = ("right", "up")
+
+                case _: branches = None
+
+            if branches is None:
+                segment.bit_rect = self.fillLaserBit(direction, (current_x, current_y))
+
+            else:
+                segment.result = "split"
+
+                for branch_direction in branches:
+                    segment.children.append(LaserSegment((current_x, current_y), branch_direction, segment))
+
+        # If the laser hits a glass box, unlock it and stop the laser
+        elif tile == 11:
+            glass_box = self.objectAt((current_x, current_y))
+
+            if not glass_box.unlocked: # Just in case its not already unlocked
+                glass_box.unlock()
+
+            segment.bit_rect = self.fillLaserBit(direction, (current_x, current_y))
 
     def assembleMap(self, main_tilesheet_path):
-        # Convert tilesheet to the tilemap
-        tilesheet = pygame.image.load(main_tilesheet_path).convert()
+        # The tilemap, the static map_image and the object spawn list only depend on the tilesheet, so they get baked to disk the first time
+        # Yields between the parts, like buildSteps()
+        bake_key = LevelRoom.bakeKey(main_tilesheet_path, self.laser["start"])
+
+        spawns = yield from self.loadBakedMap(bake_key)
+
+        if spawns is None:
+            spawns = self.drawMap(main_tilesheet_path)
+
+            # Chunked maps only get drawn as they are seen, so there isnt a whole map_image to bake
+            if not isinstance(self.map_image, utils.ChunkedSurface): self.saveBakedMap(bake_key, spawns)
+
+        yield
+
+        self.map_rect = self.map_image.get_rect()
+        self.map_borders = (0, 0, 0, 0)
+
+        # Collision index, so entities only have to check the tiles they are actually standing on
+        # solid_grid[i][j] is True for walls, doors and recievers, solid_rects holds the precomputed rects of those tiles
+        self.solid_grid = [[tile in (2, 3, 5, 6) for tile in row] for row in self.tilemap]
+        self.solid_rects = {}
 
-        for y in range(tilesheet.get_height()):
-            row = []
+        for i, row in enumerate(self.solid_grid):
+            for j, solid in enumerate(row):
+                if solid:
+                    self.solid_rects[(i, j)] = pygame.Rect(j * Tiles.size + self.map_margin_x / 2, i * Tiles.size + self.map_margin_y / 2, Tiles.size, Tiles.size)
 
-            for x in range(tilesheet.get_width()):
-                row.append(Tiles.dictionary[tuple(tilesheet.get_at((x, y)))])
+        # Weak reciever and secondary door index, so refreshWeakRecievers() doesnt have to scan the whole tilemap
+        # The states start as None/False so the first trace sets all of their textures
+        self.weak_reciever_states = {(j, i): None for i, row in enumerate(self.tilemap) for j, tile in enumerate(row) if tile == 6} # Tile position -> if its active
+        self.secondary_door_states = {room_name: False for room_name in self.connections if room_name[-2] == "_" and room_name[-1] == "5"} # Room name -> position of the weak reciever unlocking it
 
-            self.tilemap.append(row)
+        # Which side the floor is on for every door and reciever (None if there is no floor next to it), so the laser doesnt have to work it out every time it changes their textures
+        floor_masks = Tiles.neighbourMasks([[tile == 1 for tile in row] for row in self.tilemap])
+        self.facing_rotations = {(j, i): Tiles.facing_rotations[floor_masks[i][j] & 0b1111] for i, row in enumerate(self.tilemap) for j, tile in enumerate(row) if tile in (2, 5, 6)}
+
+        yield
+
+        yield from self.spawnObjects(spawns)
+
+    def drawMap(self, main_tilesheet_path):
+        # Builds the tilemap and draws the static map_image, returns the spawn list of the objects on it ([tile, tile x, tile y, rotation] for every object tile)
+        spawns = []
+
+        # Convert tilesheet to the tilemap
+        self.tilemap = Tiles.decodeTilesheet(pygame.image.load(main_tilesheet_path).convert(), main_tilesheet_path)
 
         # Construct/draw tiles to the map_image
         width, height = len(self.tilemap[0]) * Tiles.size, len(self.tilemap) * Tiles.size
@@ -747,65 +1008,98 @@ class LevelRoom(Map):
         if width  + self.map_margin_x < glb.screen_width:  self.map_margin_x += glb.screen_width  - (width  + self.map_margin_x)
         if height + self.map_margin_y < glb.screen_height: self.map_margin_y += glb.screen_height - (height + self.map_margin_y)
 
-        self.map_image = pygame.Surface((width + self.map_margin_x, height + self.map_margin_y))
-        self.map_rect = self.map_image.get_rect()
-        self.map_borders = (0, 0, 0, 0)
+        # For wall drawing logic (see Tiles.neighbour_offsets for the bits)
+        # open_masks: which neighbours are open (not empty, not wall, not entrance, not any reciever), off of the tilemap counts as NOT open
+        # empty_masks: which neighbours are empty, off of the tilemap counts as empty
+        self.open_masks  = Tiles.neighbourMasks([[tile not in (0, 3, 2, 5, 6) for tile in row] for row in self.tilemap], False)
+        self.empty_masks = Tiles.neighbourMasks([[tile == 0 for tile in row] for row in self.tilemap], True)
 
-        # For wall drawing logic
-        # Solid == 1: For checking if tile at i and j is solid (not empty, not wall, not entrance, not any reciever)
-        # Solid == 0: For checking if tile at i and j is empty
-        def isTile(i, j, solid):
-            # If the position is off of the tilemap it is automatically empty/NOT solid
-            if not (0 <= i < len(self.tilemap) and 0 <= j < len(self.tilemap[0])):
-                return not solid
+        # Collect the objects
+        for i, row in enumerate(self.tilemap):
+            for j, tile in enumerate(row):
+                match tile:
+                    case 4.0 | 4.1 | 4.2 | 4.3: spawns.append([tile, j, i, 0]) # Redirectors
 
-            if solid: return self.tilemap[i][j] not in (0, 3, 2, 5, 6)
-            else: return self.tilemap[i][j] == 0
+                    case 7.0 | 7.1 | 7.2 | 7.3: spawns.append([tile, j, i, 0]) # Blockers
 
-        # Drawing the checkerboard floor
-        for i, row in enumerate(self.tilemap):
-            # For a checkerboard pattern (0 and 1)
-            if i % 4 == 0: current_floor_tile_type = 1
-            else: current_floor_tile_type = 0
+                    case 8.0 | 8.1 | 8.2 | 8.3: spawns.append([tile, j, i, 0]) # Splitters
+
+                    case 9.0 | 9.1 | 9.2:
+                        # Lockers
+                        # Check if there doesnt exist an adjacent locker tile that is more to the left or up (means the current one is the primary locker tile)
+                        if self.tilemap[i][j-1] != tile and self.tilemap[i-1][j] != tile:
+                            # Check in which direction is the non primary locker tile -- get the value of the current locker's slots with the current tile position
+
+                            if self.tilemap[i][j+1] == tile: # Horizontal positioning
+                                spawns.append([tile, j, i, 180 if self.open_masks[i][j] & 0b0100 else 0]) # Open above
+
+                            elif self.tilemap[i+1][j] == tile: # Vertical positioning
+                                spawns.append([tile, j, i, -90 if self.open_masks[i][j] & 0b1000 else 90]) # Open to the left
+
+                    case 10: spawns.append([tile, j, i, 0]) # Automatons
+
+                    case 11: spawns.append([tile, j, i, 0]) # Glass boxes
+
+        map_size = (width + self.map_margin_x, height + self.map_margin_y)
+
+        if map_size[0] * map_size[1] > LevelRoom.max_map_image_size:
+            # Too big to keep in memory as one surface, so the chunks get drawn when the camera first sees them
+            self.map_image = utils.ChunkedSurface(map_size, background=(0, 0, 0), render_chunk=self.drawMapArea)
+
+        else:
+            self.map_image = pygame.Surface(map_size)
+            self.drawMapArea(self.map_image, self.map_image.get_rect())
+
+        return spawns
+
+    def drawMapArea(self, surface, area):
+        # Draws the part of the map under area (map_image coords) on to the surface, whose top left is the top left of the area
+        # Every floor tile gets its variation from its own seed, so chunks look the same every time they get drawn, and building a room never uses the global random (which would use up a different amount of it depending on if the map was baked)
+        first_i = max(0, int((area.top  - self.map_margin_y / 2) // Tiles.size) - 1)
+        first_j = max(0, int((area.left - self.map_margin_x / 2) // Tiles.size) - 1)
+        last_i  = min(len(self.tilemap) - 1,    int((area.bottom - self.map_margin_y / 2) // Tiles.size) + 1)
+        last_j  = min(len(self.tilemap[0]) - 1, int((area.right  - self.map_margin_x / 2) // Tiles.size) + 1)
 
+        # Drawing the checkerboard floor (every floor tile covers 2x2 regular tiles, so start on an even tile)
+        for i in range(first_i - first_i % 2, last_i + 1, 2):
             # So it doesnt draw outside of the tile map
             if i + 1 == len(self.tilemap): break
 
-            for j, tile in enumerate(row):
+            for j in range(first_j - first_j % 2, last_j + 1, 2):
+                # So it doesnt draw outside of the tile map
+                if j + 1 == len(self.tilemap[0]): break
+
                 x = j * Tiles.size + self.map_margin_x / 2
                 y = i * Tiles.size + self.map_margin_y / 2
 
-                # So it doesnt draw outside of the tile map
-                if j + 1 == len(row): break
+                # For a checkerboard pattern (0 and 1), flips with every floor tile in the row
+                current_floor_tile_type = (1 if i % 4 == 0 else 0) ^ (j // 2 % 2)
 
-                # Place a new floor tile every two regular tiles
-                if j % 2 == 0 and i % 2 == 0:
-                    floor_tile_image = None
+                tile_random = random.Random(i * 65536 + j)
 
-                    # Have a random chance to have a broken floor tile
-                    if random.randint(1, 7) == 1: floor_tile_image = Tiles.floor_tiles[f"F{current_floor_tile_type + 1}B"]
-                    else:                         floor_tile_image = Tiles.floor_tiles[f"FL{current_floor_tile_type + 1}"]
+                # Have a random chance to have a broken floor tile
+                if tile_random.randint(1, 7) == 1: floor_tile_image = Tiles.floor_tiles[f"F{current_floor_tile_type + 1}B"]
+                else:                              floor_tile_image = Tiles.floor_tiles[f"FL{current_floor_tile_type + 1}"]
 
-                    # Have a random chance to have the tile rotated
-                    if random.randint(1, 15) == 1: floor_tile_image = pygame.transform.rotate(floor_tile_image, 180)
+                # Have a random chance to have the tile rotated
+                if tile_random.randint(1, 15) == 1: floor_tile_image = pygame.transform.rotate(floor_tile_image, 180)
 
-                    self.map_image.blit(floor_tile_image, (x, y))
-
-                    current_floor_tile_type = 1 if current_floor_tile_type == 0 else 0 # Flip the type
+                surface.blit(floor_tile_image, (x - area.x, y - area.y))
 
         # Assemble the actual map_image
-        for i, row in enumerate(self.tilemap):
-            for j, tile in enumerate(row):
-                x = j * Tiles.size + self.map_margin_x / 2
-                y = i * Tiles.size + self.map_margin_y / 2
+        for i in range(first_i, last_i + 1):
+            for j in range(first_j, last_j + 1):
+                tile = self.tilemap[i][j]
+
+                x = j * Tiles.size + self.map_margin_x / 2 - area.x
+                y = i * Tiles.size + self.map_margin_y / 2 - area.y
+
+                open_mask, empty_mask = self.open_masks[i][j], self.empty_masks[i][j]
 
                 match tile:
                     case 0:
                         # Drawing the void
-                        pygame.draw.rect(self.map_image, (0, 0, 0), (x, y, Tiles.size, Tiles.size))
-
-                    case 1:
-                        pass # The floor tiles were already blitted above
+                        pygame.draw.rect(surface, (0, 0, 0), (x, y, Tiles.size, Tiles.size))
 
                     case 2:
                         # Drawing doors
@@ -815,68 +1109,185 @@ class LevelRoom(Map):
                         else:
                             adjacent_laser = False
 
-                        if   isTile(i+1, j, 1): self.map_image.blit(Tiles.wall_tiles[f"WD{'A' if adjacent_laser else 'O'}_r0"],   (x, y)) # Top
-                        elif isTile(i, j+1, 1): self.map_image.blit(Tiles.wall_tiles[f"WD{'A' if adjacent_laser else 'O'}_r90"],  (x, y)) # Left
-                        elif isTile(i-1, j, 1): self.map_image.blit(Tiles.wall_tiles[f"WD{'A' if adjacent_laser else 'O'}_r180"], (x, y)) # Bottom
-                        elif isTile(i, j-1, 1): self.map_image.blit(Tiles.wall_tiles[f"WD{'A' if adjacent_laser else 'O'}_r-90"], (x, y)) # Right
+                        rotation = Tiles.facing_rotations[open_mask & 0b1111]
+                        if rotation: surface.blit(Tiles.wall_tiles[f"WD{'A' if adjacent_laser else 'O'}_{rotation}"], (x, y))
 
                     case 3:
                         # Normal walls
-                        if   isTile(i+1, j, 1): self.map_image.blit(Tiles.wall_tiles[f"WLN_r0"],   (x, y)) # Top
-                        elif isTile(i, j+1, 1): self.map_image.blit(Tiles.wall_tiles[f"WLN_r90"],  (x, y)) # Left
-                        elif isTile(i-1, j, 1): self.map_image.blit(Tiles.wall_tiles[f"WLN_r180"], (x, y)) # Bottom
-                        elif isTile(i, j-1, 1): self.map_image.blit(Tiles.wall_tiles[f"WLN_r-90"], (x, y)) # Right
+                        rotation = Tiles.facing_rotations[open_mask & 0b1111]
+                        if rotation: surface.blit(Tiles.wall_tiles[f"WLN_{rotation}"], (x, y))
 
                         # Outer corners
-                        if   isTile(i-1, j, 0) and isTile(i, j-1, 0): self.map_image.blit(Tiles.wall_tiles[f"WOC_r0"],   (x, y))
-                        elif isTile(i+1, j, 0) and isTile(i, j-1, 0): self.map_image.blit(Tiles.wall_tiles[f"WOC_r90"],  (x, y))
-                        elif isTile(i+1, j, 0) and isTile(i, j+1, 0): self.map_image.blit(Tiles.wall_tiles[f"WOC_r180"], (x, y))
-                        elif isTile(i-1, j, 0) and isTile(i, j+1, 0): self.map_image.blit(Tiles.wall_tiles[f"WOC_r-90"], (x, y))
+                        rotation = Tiles.outer_corner_rotations[empty_mask & 0b1111]
+                        if rotation: surface.blit(Tiles.wall_tiles[f"WOC_{rotation}"], (x, y))
 
                         # Inner corners
-                        if   isTile(i+1, j, 1) and isTile(i, j+1, 1) and isTile(i-1, j-1, 0): self.map_image.blit(Tiles.wall_tiles[f"WIC_r0"],   (x, y))
-                        elif isTile(i-1, j, 1) and isTile(i, j+1, 1) and isTile(i+1, j-1, 0): self.map_image.blit(Tiles.wall_tiles[f"WIC_r90"],  (x, y))
-                        elif isTile(i-1, j, 1) and isTile(i, j-1, 1) and isTile(i+1, j+1, 0): self.map_image.blit(Tiles.wall_tiles[f"WIC_r180"], (x, y))
-                        elif isTile(i+1, j, 1) and isTile(i, j-1, 1) and isTile(i-1, j+1, 0): self.map_image.blit(Tiles.wall_tiles[f"WIC_r-90"], (x, y))
-
-                    case 4.0 | 4.1 | 4.2 | 4.3: self.objects.add(Redirector(tile, x, y, (j, i))) # Redirectors
+                        rotation = Tiles.inner_corner_rotations[(open_mask & 0b1111) | (empty_mask & 0b11110000)]
+                        if rotation: surface.blit(Tiles.wall_tiles[f"WIC_{rotation}"], (x, y))
 
                     case 5:
                         # Drawing regular recievers
                         # If its at the same position as the laser start, make it appear active because that one lets the laser into the room
                         shining_laser = self.laser["start"] == (j, i)
 
-                        if   isTile(i+1, j, 1): self.map_image.blit(Tiles.wall_tiles[f"R{'A' if shining_laser else 'E'}C_r0"],   (x, y)) # Top
-                        elif isTile(i, j+1, 1): self.map_image.blit(Tiles.wall_tiles[f"R{'A' if shining_laser else 'E'}C_r90"],  (x, y)) # Left
-                        elif isTile(i-1, j, 1): self.map_image.blit(Tiles.wall_tiles[f"R{'A' if shining_laser else 'E'}C_r180"], (x, y)) # Bottom
-                        elif isTile(i, j-1, 1): self.map_image.blit(Tiles.wall_tiles[f"R{'A' if shining_laser else 'E'}C_r-90"], (x, y)) # Right
+                        rotation = Tiles.facing_rotations[open_mask & 0b1111]
+                        if rotation: surface.blit(Tiles.wall_tiles[f"R{'A' if shining_laser else 'E'}C_{rotation}"], (x, y))
 
                     case 6:
                         # Drawing weak recievers
-                        if   isTile(i+1, j, 1): self.map_image.blit(Tiles.wall_tiles[f"WRC_r0"],   (x, y)) # Top
-                        elif isTile(i, j+1, 1): self.map_image.blit(Tiles.wall_tiles[f"WRC_r90"],  (x, y)) # Left
-                        elif isTile(i-1, j, 1): self.map_image.blit(Tiles.wall_tiles[f"WRC_r180"], (x, y)) # Bottom
-                        elif isTile(i, j-1, 1): self.map_image.blit(Tiles.wall_tiles[f"WRC_r-90"], (x, y)) # Right
+                        rotation = Tiles.facing_rotations[open_mask & 0b1111]
+                        if rotation: surface.blit(Tiles.wall_tiles[f"WRC_{rotation}"], (x, y))
 
-                    case 7.0 | 7.1 | 7.2 | 7.3: self.objects.add(Blocker(tile, x, y, (j, i))) # Blockers
+    def spawnObjects(self, spawns):
+        # Creates the objects from the spawn list (same order as the tilemap, top left to bottom right), yields after every object
+        for tile, j, i, rotation in spawns:
+            x = j * Tiles.size + self.map_margin_x / 2
+            y = i * Tiles.size + self.map_margin_y / 2
 
-                    case 8.0 | 8.1 | 8.2 | 8.3: self.objects.add(Splitter(tile, x, y, (j, i))) # Splitters
+            match tile:
+                case 4.0 | 4.1 | 4.2 | 4.3: self.objects.add(Redirector(tile, x, y, (j, i)))
+                case 7.0 | 7.1 | 7.2 | 7.3: self.objects.add(Blocker(tile, x, y, (j, i)))
+                case 8.0 | 8.1 | 8.2 | 8.3: self.objects.add(Splitter(tile, x, y, (j, i)))
+                case 9.0 | 9.1 | 9.2:       self.objects.add(Locker(tile, self.locker_items[(j ,i)], x, y, (j, i), rotation))
+                case 10:                    self.entities.add(Automaton(x, y, self))
+                case 11:                    self.objects.add(GlassBox(self.glass_box_items[(j ,i)], x, y, (j, i)))
 
-                    case 9.0 | 9.1 | 9.2:
-                        # Drawing lockers
-                        # Check if there doesnt exist an adjacent locker tile that is more to the left or up (means the current one is the primary locker tile)
-                        if self.tilemap[i][j-1] != tile and self.tilemap[i-1][j] != tile:
-                            # Check in which direction is the non primary locker tile -- get the value of the current locker's slots with the current tile position
+            yield
 
-                            if self.tilemap[i][j+1] == tile: # Horizontal positioning
-                                self.objects.add(Locker(tile, self.locker_items[(j ,i)], x, y, (j, i), 180 if isTile(i-1, j, 1) else 0))
+    # NOTE: bakeKey() and readBakedMap() dont touch the display, so RoomManager also calls them from its preloading thread
+    def bakeKey(main_tilesheet_path, laser_start):
+        # Hash of everything the baked map depends on: the tilesheet, the tile textures, the laser start (active doors/recievers) and the screen size (margins)
+        key = hashlib.md5(LevelRoom.bake_version.encode())
 
-                            elif self.tilemap[i+1][j] == tile: # Vertical positioning
-                                self.objects.add(Locker(tile, self.locker_items[(j ,i)], x, y, (j, i), -90 if isTile(i, j-1, 1) else 90))
+        with open(main_tilesheet_path, "rb") as tilesheet_file: key.update(tilesheet_file.read())
+
+        for file_name in sorted(os.listdir("assets/tiles")):
+            key.update(f"{file_name}{TextureAtlas.sourceStamp(os.path.join('assets/tiles', file_name))}".encode())
+
+        key.update(f"{laser_start}{glb.screen_width}x{glb.screen_height}".encode())
+
+        return key.hexdigest()
+
+    def readBakedMap(bake_key):
+        # Returns the baked map as (tilemap, margins, spawns, map image that still has to be converted), or None if there is no baked map for the key yet
+        image_path = os.path.join(LevelRoom.baked_maps_path, bake_key + ".png")
+        index_path = os.path.join(LevelRoom.baked_maps_path, bake_key + ".json")
+
+        if not (os.path.exists(image_path) and os.path.exists(index_path)): return None
+
+        try:
+            with open(index_path) as index_file: baked = json.load(index_file)
+            map_image = pygame.image.load(image_path)
+        except (OSError, ValueError, pygame.error):
+            return None # Broken files, the map gets drawn again
+
+        return baked["tilemap"], baked["margins"], baked["spawns"], map_image
+
+    def loadBakedMap(self, bake_key):
+        # Returns the spawn list of the baked map, or None if there is no baked map for the key yet
+        # Preloaded maps were already read by RoomManager, which also made blank surfaces for them (in the display's format), so they only have to be blitted on to those
+        # That gets done a strip at a time, yielding after every strip
+        baked, blank_map_image, self.laser_surf = LevelRoom.preloaded_maps.pop(bake_key, None) or (LevelRoom.readBakedMap(bake_key), None, None)
+        if baked is None: return None
+
+        self.tilemap, (self.map_margin_x, self.map_margin_y), spawns, map_image = baked
+
+        if blank_map_image is None:
+            self.map_image = map_image.convert()
+
+        else:
+            self.map_image = blank_map_image
+
+            for y in range(0, map_image.get_height(), LevelRoom.convert_strip_height):
+                self.map_image.blit(map_image, (0, y), (0, y, map_image.get_width(), LevelRoom.convert_strip_height))
+
+                yield
+
+        return spawns
+
+    def saveBakedMap(self, bake_key, spawns):
+        os.makedirs(LevelRoom.baked_maps_path, exist_ok=True)
+        pygame.image.save(self.map_image, os.path.join(LevelRoom.baked_maps_path, bake_key + ".png"))
+
+        with open(os.path.join(LevelRoom.baked_maps_path, bake_key + ".json"), "w") as index_file:
+            json.dump({"tilemap": self.tilemap, "margins": [self.map_margin_x, self.map_margin_y], "spawns": spawns}, index_file)
+
+    def snapshotState(self):
+        # Everything the player can change in the room, so RoomManager can drop the room (and its surfaces) and create it again later
+        snapshot = {
+            "redirectors": {},    # Tile position -> type
+            "blockers": {},       # Tile position -> active
+            "lockers": {},        # Tile position -> (unlocked, scrap names in the slots ("" for empty slots))
+            "glass_boxes": {},    # Tile position -> (unlocked, collected, has ricch)
+            "automatons": [(automaton.x, automaton.y, automaton.health) for automaton in self.entities if type(automaton) == Automaton],
+            "connections": dict(self.connections),
+            "interactable_redirectors": self.interactable_redirectors,
+            "reward_locker_key_dropped": self.reward_locker_key_dropped,
+            "reward_locker_key_pos": self.reward_locker_key_pos,
+            "dropped_locker_keys": [(item.x, item.y) for item in self.dropped_items if type(item) == PickupableItem] # Keys that havent been picked up yet
+        }
+
+        for object in self.objects:
+            if   type(object) == Redirector: snapshot["redirectors"][object.tile_pos] = object.type
+            elif type(object) == Blocker:    snapshot["blockers"][object.tile_pos] = object.active
+            elif type(object) == Locker:     snapshot["lockers"][object.tile_pos] = (object.unlocked, [item if item == "" else item.name for item in object.slots])
+            elif type(object) == GlassBox:   snapshot["glass_boxes"][object.tile_pos] = (object.unlocked, object.item is None, object.has_ricch)
+
+        return snapshot
+
+    def restoreState(self, snapshot):
+        # Puts the objects spawned by assembleMap() back into the state from snapshotState() (the laser path gets traced after this)
+        for object in self.objects:
+            if type(object) == Redirector:
+                object.type = snapshot["redirectors"][object.tile_pos]
+                self.tilemap[object.tile_pos[1]][object.tile_pos[0]] = object.type # The laser goes by the tilemap
+
+                object.reset()
+                object.image = object.og_image
+
+            elif type(object) == Blocker:
+                object.active = snapshot["blockers"][object.tile_pos]
+
+                object.reset()
+                object.image = object.og_image
+
+            elif type(object) == Locker:
+                object.unlocked, slots = snapshot["lockers"][object.tile_pos]
+                object.slots = [scrap_name if scrap_name == "" else InterfaceItem(scrap_name, "", Scraps.dictionary[scrap_name]) for scrap_name in slots]
+
+            elif type(object) == GlassBox:
+                unlocked, collected, has_ricch = snapshot["glass_boxes"][object.tile_pos]
+
+                # Same as unlock() and collectLoot(), without the score, sounds and animation
+                if unlocked:
+                    object.unlocked = True
+                    object.og_image = Tiles.object_tiles["GBU"].copy()
+                    object.image = object.og_image
+
+                if collected:
+                    object.item = None
+                    object.image = Tiles.object_tiles["GBE"].copy()
+
+                # The item hasnt been taken yet, so what comes out of the box still matters
+                elif has_ricch != object.has_ricch:
+                    object.has_ricch = has_ricch
+                    object.anim_item = InterfaceItem("ricch", "", utils.displayFormat(pygame.image.load("assets/ui/unused/ricch.png"))) if has_ricch else object.item
+                    object.anim_x = object.x + (object.image.get_width() - object.anim_item.normal_image.get_width()) // 2
+
+        self.entities.empty()
+
+        for x, y, health in snapshot["automatons"]:
+            automaton = Automaton(x, y, self)
+            automaton.health = health
+
+            self.entities.add(automaton)
 
-                    case 10: self.entities.add(Automaton(x, y, self)) # Automatons
+        self.interactable_redirectors = snapshot["interactable_redirectors"]
+        self.reward_locker_key_dropped = snapshot["reward_locker_key_dropped"]
+        self.reward_locker_key_pos = snapshot["reward_locker_key_pos"]
 
-                    case 11: self.objects.add(GlassBox(self.glass_box_items[(j ,i)], x, y, (j, i))) # Glass boxes
+        for x, y in snapshot["dropped_locker_keys"]:
+            self.dropped_items.add(PickupableItem("locker key", x, y, "assets/items/locker_key.png"))
 
     def onEnter(self, entering_from):
         if LevelRoom.first_time:
@@ -1,5 +1,7 @@
 import pygame
 import globals as glb
+import settings
+import utils
 from scene import NamePrompt
 
 pygame.init()
@@ -10,29 +12,71 @@ pygame.display.set_icon(pygame.image.load("assets/icon.png"))
 glb.scene_manager.changeScene(NamePrompt(), 100) # 100 skips the fade out
 glb.sound_engine.playMusic("ambience")
 
+# Both of these also seed the random module, so the replay plays out exactly like the recorded session
+if   settings.replay_input_path: glb.input_stream.startReplay(settings.replay_input_path)
+elif settings.record_input_path: glb.input_stream.startRecording(settings.record_input_path)
+
+# Fixed timestep: input() and update() always run tick_rate times per second (all of the gameplay timers count in those steps), draw() runs as often as the machine can keep up with
+step_time = 1000 / settings.tick_rate # In milliseconds
+max_steps_per_frame = 10 # If a frame took longer than this many steps, the game slows down instead of trying to catch up forever
+accumulated_time = 0
+pending_events = [] # Events that came in since the last step (a frame can run no steps at all)
+
 running = True
 while running:
-    # Pygame.event.get() clears the events once its called, so a copy will be sent to the InputStream
+    # Pygame.event.get() clears the events once its called, so they get kept until a step hands them to the InputStream
     events = pygame.event.get()
-
-    glb.input_stream.general_events = events
+    pending_events += events
 
     # Goes through all events and if *any* one of them is QUIT (returns true) "not" flips it in to False - exiting the loop
     running = not any(event.type == pygame.QUIT for event in events)
 
-    glb.input_stream.processInput()
+    # Headless mode doesnt wait for the clock, every frame is exactly one step
+    if settings.headless: accumulated_time = step_time
+    else:                 accumulated_time = min(accumulated_time + glb.clock.tick(settings.max_frame_rate), step_time * max_steps_per_frame)
+
+    while accumulated_time >= step_time:
+        # Only the first step of a frame gets the events, so key presses dont get typed twice
+        glb.input_stream.general_events = pending_events
+        pending_events = []
+
+        glb.input_stream.processInput()
+
+        # Profiler debug keys
+        if glb.input_stream.keyboard.isKeyPressed(settings.profiler_key):
+            utils.Profiler.setEnabled(not utils.Profiler.enabled)
+            glb.engine.invalidate() # Dirty rect rendering wouldnt clear the overlay off the screen on its own
+
+        if glb.input_stream.keyboard.isKeyPressed(settings.profiler_export_key) and utils.Profiler.enabled: utils.Profiler.export()
+
+        glb.scene_manager.input()
+        glb.scene_manager.update()
+
+        with utils.Profiler.section("SoundEngine.update"): glb.sound_engine.update() # Music fading is counted in steps too
+
+        accumulated_time -= step_time
+
+    dirty_rects = glb.scene_manager.draw()
+
+    if utils.Profiler.enabled:
+        utils.Profiler.drawOverlay(glb.screen)
+        dirty_rects = None # The overlay isnt in the dirty rects
 
-    glb.scene_manager.input()
-    glb.scene_manager.update()
-    glb.scene_manager.draw()
+    # There is no window to show anything in headless mode
+    if settings.headless:
+        utils.Profiler.endFrame()
+        continue
 
-    glb.sound_engine.update()
+    # Only push the changed parts of the screen to the display if the scene reported them
+    with utils.Profiler.section("display.flip"):
+        if dirty_rects is None: pygame.display.flip()
+        else:                   pygame.display.update(dirty_rects)
 
-    pygame.display.flip()
+    utils.Profiler.endFrame()
 
     pygame.display.set_caption(f'Laserpunk @ {int(glb.clock.get_fps())} FPS')
 
-    glb.clock.tick(100)
+glb.input_stream.stop() # Writes out the rest of the recording
 
 # Save the game before it closes
 glb.db_data.writeData()
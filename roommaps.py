@@ -1,7 +1,8 @@
 from engine import LevelRoom, InterfaceItem
 from dictionaries import *
 
-# NOTE: The map classes must always have their connections accessible
+# NOTE: The map classes must always have their connections, tilesheet path and laser accessible (RoomManager preloads rooms with them)
+# and pass the snapshot on to LevelRoom (RoomManager creates evicted rooms again with it)
 
 class Room1Map(LevelRoom):
     connections = {
@@ -10,15 +11,17 @@ class Room1Map(LevelRoom):
         "to_be_continued": (-1, (0,  14)),
         "room_4":          (5,  (37, 8 ))
     }
+    tilesheet_path = "assets/tilesheets/room_1.png"
+    laser = {
+        "start": (18, 28),
+        "direction": "right"
+    }
 
-    def __init__(self):
+    def __init__(self, snapshot=None):
         super().__init__(
-            "assets/tilesheets/room_1.png",
+            Room1Map.tilesheet_path,
             Room1Map.connections,
-            { # Laser
-                "start": (18, 28),
-                "direction": "right"
-            },
+            Room1Map.laser,
             { # Locker items (NOTE: 2 lead are here so the player can craft the lvl 2 access card, can be removed when expanding to level 2)
                 (23, 30): ["brass", "copper", "", ""],
                 (36, 4):  ["copper", "", "brass", ""],
@@ -26,22 +29,25 @@ class Room1Map(LevelRoom):
                 (16, 1):  ["", "copper", "lead", "brass"],
                 (18, 15): ["", "copper", "", "brass"],
                 (1, 10):  ["", "lead", "brass", "copper"]
-            }
+            },
+            snapshot=snapshot
         )
 
 class Room1_5Map(LevelRoom):
     connections = {
         "room_1": (0, (0, 11))
     }
+    tilesheet_path = "assets/tilesheets/room_1_5.png"
+    laser = {
+        "start": (0, 12),
+        "direction": "right"
+    }
 
-    def __init__(self):
+    def __init__(self, snapshot=None):
         super().__init__(
-            "assets/tilesheets/room_1_5.png",
+            Room1_5Map.tilesheet_path,
             Room1_5Map.connections,
-            { # Laser
-                "start": (0, 12),
-                "direction": "right"
-            },
+            Room1_5Map.laser,
             { # Locker items
                 (1, 1):   ["brass", "copper", "", ""],
                 (9, 5):   ["copper", "", "brass", ""],
@@ -52,5 +58,6 @@ class Room1_5Map(LevelRoom):
             },
             { # Glass box
                 (17, 7): InterfaceItem("gold", "", Scraps.dictionary["lead"])
-            }
+            },
+            snapshot=snapshot
         )
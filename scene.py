@@ -87,19 +87,28 @@ class SceneManager:
         if self.current_scene == glb.main_menu and scene == glb.engine and hasattr(glb.engine, "paused") and glb.engine.paused:
             self.transition.fade_in_speed = 1.5
 
+    @utils.Profiler.timed
     def input(self):
         if not self.transition.active: self.current_scene.input(glb.input_stream)
 
+    @utils.Profiler.timed
     def update(self):
         if self.current_scene is not None: self.current_scene.update()
 
         if self.transition.active: self.transition.update()
 
+    @utils.Profiler.timed
     def draw(self):
-        if self.current_scene is not None: self.current_scene.draw(glb.screen)
+        # Returns the screen rects that changed, None means the whole screen has to be updated
+        dirty_rects = None
+        if self.current_scene is not None: dirty_rects = self.current_scene.draw(glb.screen)
 
         # If the transition is active, draw the fade on top
-        if self.transition.active: glb.screen.blit(self.transition.fade_surface, (0, 0))
+        if self.transition.active:
+            glb.screen.blit(self.transition.fade_surface, (0, 0))
+            dirty_rects = None
+
+        return dirty_rects
 
 class NamePrompt:
     def __init__(self):
@@ -166,6 +175,15 @@ class NamePrompt:
 
                     glb.scene_manager.changeScene(SaveSelect())
 
+        # Blink the typing indicator
+        if self.indicator_timer > 0:
+            self.indicator_timer -= 1
+
+            if self.indicator_timer == 0:
+                self.indicator_timer = 80
+
+                self.indicator_visible = not self.indicator_visible
+
     def draw(self, screen):
         screen.fill((0, 0, 0))
 
@@ -175,14 +193,6 @@ class NamePrompt:
         if len(self.name_text) != 0:
             screen.blit(self.name_text_surf, self.name_text_pos)
 
-        if self.indicator_timer > 0:
-            self.indicator_timer -= 1
-
-            if self.indicator_timer == 0:
-                self.indicator_timer = 80
-
-                self.indicator_visible = not self.indicator_visible
-
         if self.indicator_visible:
             screen.blit(
                 self.indicator,
@@ -318,7 +328,7 @@ class ToBeContinued:
 
         self.initial_wait = 300 # So the counting doesnt start when its still transitioning to this scene
 
-        self.your_score_text = self.font_tier_1.render("Score")
+        self.your_score_text = self.font_tier_1.renderText("Score") # Its own surface (not the shared one from render()), its alpha gets changed
         self.your_score_text = pygame.transform.scale(self.your_score_text, (self.your_score_text.get_width() * 1.5, self.your_score_text.get_height() * 1.5))
         self.your_score_text.set_alpha(0)
         self.your_score_text_pos = ((glb.screen_width - self.your_score_text.get_width()) // 2, 340)
@@ -327,7 +337,7 @@ class ToBeContinued:
         self.counter_current_alpha = 0
         self.counter_target_alpha = 255
 
-        self.counter_text = self.font_tier_1.render("0")
+        self.counter_text = self.font_tier_1.renderText("0")
         self.counter_text = pygame.transform.scale(self.counter_text, (self.counter_text.get_width() * 1.5, self.counter_text.get_height() * 1.5))
         self.counter_text.set_alpha(0)
         self.counter_text_pos = ((glb.screen_width - self.counter_text.get_width()) // 2, 400)
@@ -406,7 +416,7 @@ class ToBeContinued:
             else:
                 base_counter_text = None # Just in case
 
-            # Update the counter text
+            # Update the counter text (scaling makes a new surface, so changing its alpha doesnt touch the shared one from render())
             base_counter_text = pygame.transform.scale(base_counter_text, (base_counter_text.get_width() * 1.5, base_counter_text.get_height() * 1.5))
 
             # Apply scaling if its not the normal size
@@ -532,6 +542,7 @@ class MainMenu:
         self.title_image = self.title_normal
         self.title_rect = pygame.Rect((glb.screen_width - self.title_normal.get_width()) // 2, 110, self.title_normal.get_width(), self.title_normal.get_height())
         self.title_shake_timer = 0
+        self.shake_random = random.Random() # Its own generator because the shaking happens in draw(), which doesnt run a fixed number of times per step (replays rely on the random module)
         self.title_bobbing_offset = -9 # Bobbs up and down 10px
         self.title_bobbing_direction = "down"
 
@@ -570,13 +581,13 @@ class MainMenu:
             self.doesnt_know_the_buttons_timer = 1000
 
             # VISIBLE VARIANTS BECAUSE MFS ARE BLIND
-            self.play_visible = utils.loadScaledAsset("assets/main_menu/play_visible.png")
+            self.play_visible = utils.loadScaledAsset("assets/main_menu/play_visible.png", copy=True)
             self.play_visible.set_alpha(0)
-            self.play_hovered_visible = utils.loadScaledAsset("assets/main_menu/play_hovered_visible.png")
+            self.play_hovered_visible = utils.loadScaledAsset("assets/main_menu/play_hovered_visible.png", copy=True)
             self.play_hovered_visible.set_alpha(0)
-            self.settings_visible = utils.loadScaledAsset("assets/main_menu/settings_visible.png")
+            self.settings_visible = utils.loadScaledAsset("assets/main_menu/settings_visible.png", copy=True)
             self.settings_visible.set_alpha(0)
-            self.settings_hovered_visible = utils.loadScaledAsset("assets/main_menu/settings_hovered_visible.png")
+            self.settings_hovered_visible = utils.loadScaledAsset("assets/main_menu/settings_hovered_visible.png", copy=True)
             self.settings_hovered_visible.set_alpha(0)
 
             # Visible buttons alpha animation variables
@@ -587,6 +598,10 @@ class MainMenu:
 
         # Settings view
         self.close_settings_button = utils.Button((glb.screen_width - 180 - 64, 308), "assets/main_menu/close_settings.png", "assets/main_menu/close_settings_hovered.png", closeSettings, "menu_button")
+        # Its images get their alpha changed, so they need their own copies (loadScaledAsset() images are shared)
+        self.close_settings_button.image = self.close_settings_button.image.copy()
+        self.close_settings_button.hover_image = self.close_settings_button.hover_image.copy()
+        self.close_settings_button.current_image = self.close_settings_button.image
         self.close_settings_button.current_image.set_alpha(0) # This button appears when opening settings and disappears when closing them
 
         self.settings_panel = SettingsPanel()
@@ -685,6 +700,8 @@ class MainMenu:
                 # And make the close settings button fully invisible
                 self.close_settings_button.current_image.set_alpha(0)
 
+        self.door_anim.update()
+
         # Only bob the title up and down when its not shaking
         if self.title_shake_timer == 0:
             if self.title_bobbing_direction == "up":
@@ -712,6 +729,10 @@ class MainMenu:
         if data.DBData.first_time and self.doesnt_know_the_buttons_timer > 0:
             self.doesnt_know_the_buttons_timer -= 1
 
+        # Count down the title shake (only while the title is in the window view, where it gets drawn)
+        if self.bg_image_x < 1050 and self.title_shake_timer > 0:
+            self.title_shake_timer -= 1
+
     def draw(self, screen):
         # Background drawing
         screen.blit(self.bg_image,    (self.bg_image_x - 264 * 4, 0))
@@ -724,9 +745,7 @@ class MainMenu:
             screen.blit(self.title_flash, (self.bg_image_x + self.title_rect.x + self.title_rect.width - 45, 37 + self.ui_vertical_offset + self.title_bobbing_offset))
 
             if self.title_shake_timer > 0:
-                self.title_shake_timer -= 1
-
-                screen.blit(self.title_image, (self.bg_image_x + self.title_rect.x + random.randint(-3, 3), self.title_rect.y + random.randint(-3, 3)))
+                screen.blit(self.title_image, (self.bg_image_x + self.title_rect.x + self.shake_random.randint(-3, 3), self.title_rect.y + self.shake_random.randint(-3, 3)))
 
             else:
                 screen.blit(self.title_image, (self.bg_image_x + self.title_rect.x, self.title_rect.y + self.ui_vertical_offset))
@@ -1,7 +1,47 @@
 import pygame
+import os
+import sys
 
 darkness = True
 hints = True
 music_volume = 100
 movement = [pygame.K_w, pygame.K_a, pygame.K_s, pygame.K_d]
 sprint_key = pygame.K_LSHIFT
+
+# Run without a window or sound, as fast as possible (for running the game in CI), turned on with the LASERPUNK_HEADLESS=1 environment variable or the --headless flag
+headless = os.environ.get("LASERPUNK_HEADLESS", "0") != "0" or "--headless" in sys.argv
+
+# Record the input of the session to a file, or replay a recorded session (--record <path> or --replay <path>, or the LASERPUNK_RECORD and LASERPUNK_REPLAY environment variables)
+record_input_path = sys.argv[sys.argv.index("--record") + 1] if "--record" in sys.argv[:-1] else os.environ.get("LASERPUNK_RECORD")
+replay_input_path = sys.argv[sys.argv.index("--replay") + 1] if "--replay" in sys.argv[:-1] else os.environ.get("LASERPUNK_REPLAY")
+
+# The database file the saves are in (the LASERPUNK_SAVES environment variable, a replay has to start from the same saves as the recorded session did)
+saves_path = os.environ.get("LASERPUNK_SAVES", "saves.db")
+
+# Create the rooms next to the current one in the background (off when recording or replaying, the background rooms would get created on different steps)
+preload_rooms = record_input_path is None and replay_input_path is None
+
+# Simulation steps per second, every gameplay timer counts in these (not saved in the database)
+tick_rate = 100
+
+# Most frames drawn per second, 0 means no limit (not saved in the database)
+max_frame_rate = 100
+
+# Only redraw the parts of the screen that changed since the last frame (not saved in the database, off by default)
+dirty_rendering = False
+
+# Debug keys for the profiler overlay, and for writing what it recorded to the profiles folder (not saved in the database)
+profiler_key = pygame.K_F3
+profiler_export_key = pygame.K_F4
+
+# Print a warning when a surface that isnt in the display's pixel format gets blitted on a render layer (not saved in the database, off by default)
+debug_surface_formats = False
+
+# How many of the visited level rooms stay fully loaded, the least recently visited ones get saved to a small snapshot and are created again when needed (not saved in the database)
+max_live_rooms = 3
+
+# Bytes the surfaces of the active rooms can take up before the preloaded rooms furthest away get dropped (not saved in the database)
+preload_memory_budget = 256 * 1024 * 1024
+
+# Seconds every frame can spend building preloaded rooms, build steps keep running until this is used up so one step can go over it (not saved in the database)
+preload_frame_time = 0.001
@@ -8,6 +8,24 @@ class SoundEngine:
         # Sounds can be played on top of eachother
         # Music can only play one at a time, repeats when it reaches the end, fades in and out
 
+        self.loadSounds()
+
+        self.music = {
+            "main_theme" : "assets/music/main_theme.ogg",
+            "ambience": "assets/music/ambience.ogg",
+            "test" : "assets/ui/unused/test.ogg",
+            "u_music": "assets/ui/unused/music.ogg",
+            "u2_music": "assets/ui/unused/music2.ogg"
+        }
+
+        self.current_music = None
+        self.next_music = None
+        self.next_music_info = None
+
+        self.fading_music_target_volume = -1
+        self.current_music_volume_precise = -1
+
+    def loadSounds(self):
         self.sounds = {
             "menu_button" : pygame.mixer.Sound("assets/sounds/menu_button.ogg"),
             "title_clicked" : pygame.mixer.Sound("assets/sounds/title_clicked.ogg"),
@@ -33,21 +51,6 @@ class SoundEngine:
             "locker_close" : pygame.mixer.Sound("assets/sounds/locker_close.ogg")
         }
 
-        self.music = {
-            "main_theme" : "assets/music/main_theme.ogg",
-            "ambience": "assets/music/ambience.ogg",
-            "test" : "assets/ui/unused/test.ogg",
-            "u_music": "assets/ui/unused/music.ogg",
-            "u2_music": "assets/ui/unused/music2.ogg"
-        }
-
-        self.current_music = None
-        self.next_music = None
-        self.next_music_info = None
-
-        self.fading_music_target_volume = -1
-        self.current_music_volume_precise = -1
-
     def playSound(self, sound_name, sound_volume = 0.4, looping = False):
         self.sounds[sound_name].set_volume(sound_volume * (settings.music_volume / 100))
         self.sounds[sound_name].play(loops = 0 if not looping else -1)
@@ -97,3 +100,19 @@ class SoundEngine:
             self.current_music_volume_precise = round(self.current_music_volume_precise, 3)
 
             pygame.mixer.music.set_volume(round(self.current_music_volume_precise, 1))
+
+class SilentSoundEngine(SoundEngine):
+    # Used in headless mode, keeps track of the music like SoundEngine does but never decodes or plays anything
+    # The mixer still gets initialized (on the dummy audio driver), so the places that set the music volume directly keep working
+
+    def loadSounds(self):
+        self.sounds = {}
+
+    def playSound(self, sound_name, sound_volume = 0.4, looping = False):
+        pass
+
+    def stopSound(self, sound_name):
+        pass
+
+    def playMusic(self, music_name, music_volume = 1, fade_in_time = 100, start=0.0):
+        self.current_music = music_name
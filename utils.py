@@ -1,20 +1,465 @@
 import pygame
 import pygame.freetype
+import csv
+import json
+import os
+import time
+from collections import OrderedDict, deque
+from contextlib import nullcontext
+from functools import wraps
 import globals as glb
+import settings
 from PIL import Image
 
 pygame.freetype.init() # For the Typer
 
+class AssetCache:
+    # NOTE: These variables are at class level, there is only one cache for the whole game
+    # Keeps the surfaces loaded by loadScaledAsset() so the same file doesnt get read and scaled again, least recently used ones get dropped first
+
+    surfaces = OrderedDict() # Keys are (path, scale, rotation, convert mode), the most recently used surface is at the end
+    size_limit = 128 * 1024 * 1024 # In bytes (everything the game loads at startup takes up about 55 MB)
+    size = 0
+
+    # For profiling
+    hits = 0
+    misses = 0
+
+    def surfaceSize(surface):
+        return surface.get_width() * surface.get_height() * surface.get_bytesize()
+
+    def get(key):
+        surface = AssetCache.surfaces.get(key)
+
+        if surface is None:
+            AssetCache.misses += 1
+            return None
+
+        AssetCache.hits += 1
+        AssetCache.surfaces.move_to_end(key)
+
+        return surface
+
+    def add(key, surface):
+        AssetCache.surfaces[key] = surface
+        AssetCache.size += AssetCache.surfaceSize(surface)
+
+        # Drop the least recently used surfaces until it fits (the newest one always stays)
+        while AssetCache.size > AssetCache.size_limit and len(AssetCache.surfaces) > 1:
+            _, dropped_surface = AssetCache.surfaces.popitem(last=False)
+            AssetCache.size -= AssetCache.surfaceSize(dropped_surface)
+
+    def clear():
+        AssetCache.surfaces.clear()
+        AssetCache.size = 0
+
+class Profiler:
+    # NOTE: These variables are at class level, there is only one profiler for the whole game
+    # Measures how long the instrumented parts of the game take every frame, shown by the overlay (toggled with settings.profiler_key)
+    # The hooks only check Profiler.enabled and return when it is off, so they can stay in the code:
+    # - "with utils.Profiler.section("name"):" times a block
+    # - "@utils.Profiler.timed" times every call of a function (named after it)
+    # - "utils.Profiler.count("name", amount)" counts something per frame (hot loops should check Profiler.enabled before calling it)
+
+    enabled = False
+
+    history = deque(maxlen=1000) # The last finished frames as (start time, section times, counts, trace events), for the overlay and the exports
+    overlay_frames = 100 # How many of the last frames the overlay averages
+    overlay_refresh = 25 # Frames between re-rendering the overlay, the numbers would be unreadable otherwise
+    export_path = "profiles"
+
+    # The current frame
+    frame_start = 0
+    times = {}  # Section name -> seconds spent in it
+    counts = {} # Counter name -> count
+    events = [] # (section name, start time, duration) of every timed call, for the chrome trace
+
+    overlay = None
+    overlay_timer = 0
+    font = None
+
+    class Section:
+        def __init__(self, name):
+            self.name = name
+
+        def __enter__(self):
+            self.start = time.perf_counter()
+
+        def __exit__(self, *exception_info):
+            Profiler.add(self.name, self.start, time.perf_counter() - self.start)
+
+    no_section = nullcontext() # What section() returns when the profiler is off
+
+    def setEnabled(enabled):
+        Profiler.enabled = enabled
+
+        Profiler.history.clear()
+        Profiler.startFrame()
+
+    def section(name):
+        return Profiler.Section(name) if Profiler.enabled else Profiler.no_section
+
+    def timed(function):
+        name = function.__qualname__
+
+        @wraps(function)
+        def timedFunction(*args, **kwargs):
+            if not Profiler.enabled: return function(*args, **kwargs)
+
+            start = time.perf_counter()
+
+            try:     return function(*args, **kwargs)
+            finally: Profiler.add(name, start, time.perf_counter() - start)
+
+        return timedFunction
+
+    def add(name, start, duration):
+        Profiler.times[name] = Profiler.times.get(name, 0) + duration
+        Profiler.events.append((name, start, duration))
+
+    def count(name, amount=1):
+        if Profiler.enabled: Profiler.counts[name] = Profiler.counts.get(name, 0) + amount
+
+    def startFrame():
+        Profiler.frame_start = time.perf_counter()
+        Profiler.times = {}
+        Profiler.counts = {}
+        Profiler.events = []
+
+    def endFrame():
+        if not Profiler.enabled: return
+
+        Profiler.history.append((Profiler.frame_start, Profiler.times, Profiler.counts, Profiler.events))
+        Profiler.startFrame()
+
+    def drawOverlay(surface):
+        if Profiler.overlay is None or Profiler.overlay_timer == 0: Profiler.overlay = Profiler.renderOverlay()
+        Profiler.overlay_timer = (Profiler.overlay_timer + 1) % Profiler.overlay_refresh
+
+        surface.blit(Profiler.overlay, (8, 8))
+
+    def renderOverlay():
+        if Profiler.font is None: Profiler.font = SmallFont((255, 255, 255, 255))
+
+        frames = list(Profiler.history)[-Profiler.overlay_frames:]
+        frame_count = max(len(frames), 1)
+
+        # Average and worst milliseconds per frame for every section, average per frame for every counter
+        lines = [f"FRAME {(frames[-1][0] - frames[0][0]) / max(len(frames) - 1, 1) * 1000:.2f} MS" if len(frames) > 1 else "FRAME"]
+
+        for name in sorted({name for _, times, _, _ in frames for name in times}):
+            section_times = [times.get(name, 0) * 1000 for _, times, _, _ in frames]
+            lines.append(f"{name} {sum(section_times) / frame_count:.2f} MS  MAX {max(section_times):.2f}")
+
+        for name in sorted({name for _, _, counts, _ in frames for name in counts}):
+            lines.append(f"{name} {sum(counts.get(name, 0) for _, _, counts, _ in frames) / frame_count:.0f}")
+
+        line_surfs = [Profiler.font.renderText(line.replace("_", " ")) for line in lines] # Every line is new, so they skip the font's cache
+
+        overlay = pygame.Surface((max(line_surf.get_width() for line_surf in line_surfs) + 16, len(line_surfs) * SmallFont.LINE_HEIGHT + 8), pygame.SRCALPHA)
+        overlay.fill((0, 0, 0, 180))
+
+        for i, line_surf in enumerate(line_surfs): overlay.blit(line_surf, (8, 8 + i * SmallFont.LINE_HEIGHT))
+
+        return overlay
+
+    def exportCSV(path):
+        # One row per frame: when it started, the milliseconds spent in every section and every counter
+        sections = sorted({name for _, times, _, _ in Profiler.history for name in times})
+        counters = sorted({name for _, _, counts, _ in Profiler.history for name in counts})
+
+        with open(path, "w", newline="") as csv_file:
+            writer = csv.writer(csv_file)
+            writer.writerow(["frame_start_ms"] + [f"{name}_ms" for name in sections] + counters)
+
+            for frame_start, times, counts, _ in Profiler.history:
+                writer.writerow([round(frame_start * 1000, 3)] + [round(times.get(name, 0) * 1000, 4) for name in sections] + [counts.get(name, 0) for name in counters])
+
+    def exportChromeTrace(path):
+        # Can be opened in chrome://tracing or ui.perfetto.dev, the sections nest like the calls did and the counters are graphs
+        trace_events = []
+
+        for frame_start, _, counts, events in Profiler.history:
+            for name, start, duration in events:
+                trace_events.append({"name": name, "ph": "X", "ts": round(start * 1e6, 3), "dur": round(duration * 1e6, 3), "pid": 0, "tid": 0})
+
+            for name, count in counts.items():
+                trace_events.append({"name": name, "ph": "C", "ts": round(frame_start * 1e6, 3), "pid": 0, "args": {name: count}})
+
+        with open(path, "w") as trace_file: json.dump({"traceEvents": trace_events, "displayTimeUnit": "ms"}, trace_file)
+
+    def export():
+        # Writes the recorded frames to profiles/profile_<date>_<time>.csv and .json (chrome trace)
+        os.makedirs(Profiler.export_path, exist_ok=True)
+        path = os.path.join(Profiler.export_path, time.strftime("profile_%Y%m%d_%H%M%S"))
+
+        Profiler.exportCSV(path + ".csv")
+        Profiler.exportChromeTrace(path + ".json")
+
+        print(f"Profile of the last {len(Profiler.history)} frames written to {path}.csv and {path}.json")
+
 # Returns the loaded image asset, scaled up 4 times, optionally rotated
 # Intended to prevent having to manually scale up every pixel art image
-def loadScaledAsset(image_path, scale=4, rotation=0):
-    image = pygame.image.load(image_path)
+# NOTE: The returned surface is shared with everyone else that loads the same asset, so use copy=True if it is going to be changed (set_alpha(), blitting on it...)
+def loadScaledAsset(image_path, scale=4, rotation=0, copy=False):
+    # Surfaces loaded before the display exists cant be converted, so they are kept separately
+    key = (image_path, scale, rotation, "display" if pygame.display.get_surface() is not None else "none")
+
+    image = AssetCache.get(key)
+
+    if image is None:
+        image = pygame.image.load(image_path)
+
+        if rotation != 0: image = pygame.transform.rotate(image, rotation)
+
+        width, height = image.get_size()
+
+        image = displayFormat(pygame.transform.scale(image, (width * scale, height * scale)))
+        AssetCache.add(key, image)
+
+    return image.copy() if copy else image
+
+# Returns the surface converted to the pixel format of the display, so pygame doesnt have to convert it on every blit
+# Surfaces with per pixel alpha keep it (convert_alpha), everything else gets converted to the opaque format (colorkeys are kept)
+def displayFormat(surface):
+    if pygame.display.get_surface() is None: return surface # Nothing to convert to yet
+
+    if surface.get_flags() & pygame.SRCALPHA: return surface.convert_alpha()
+
+    return surface.convert()
+
+display_formats = [] # Pixel formats of convert() and convert_alpha() surfaces, filled in the first time checkSurfaceFormat() is called
+warned_formats = set() # So every unconverted surface size/format only gets reported once
+
+# Debug check for surfaces that would get converted on every blit (enabled with settings.debug_surface_formats)
+def checkSurfaceFormat(surface):
+    if not display_formats:
+        display_formats[:] = [(format_surface.get_bitsize(), format_surface.get_masks()) for format_surface in (pygame.Surface((1, 1)).convert(), pygame.Surface((1, 1), pygame.SRCALPHA).convert_alpha())]
+
+    surface_format = (surface.get_bitsize(), surface.get_masks())
+    if surface_format in display_formats: return
+
+    if (surface.get_size(), surface_format) not in warned_formats:
+        warned_formats.add((surface.get_size(), surface_format))
+        print(f"Unconverted surface blitted: size {surface.get_size()}, {surface_format[0]} bit, masks {surface_format[1]} (load it through utils.loadScaledAsset() or utils.displayFormat())")
+
+# Returns how far the rect can actually move with the velocity (vx, vy) before it hits any of the blocker rects
+# Resolves the X axis first and then the Y axis from the new X position, so the rect slides along walls instead of sticking to them
+# Blockers that the rect is already overlapping are ignored (so a stuck entity can walk out)
+def sweptMove(rect, vx, vy, blockers):
+    allowed_vx, allowed_vy = vx, vy
+
+    for blocker in blockers:
+        # Only blockers in the same row as the rect can stop a horizontal move
+        if blocker.bottom <= rect.top or blocker.top >= rect.bottom: continue
+
+        if   vx > 0 and blocker.left >= rect.right: allowed_vx = min(allowed_vx, blocker.left - rect.right)
+        elif vx < 0 and blocker.right <= rect.left: allowed_vx = max(allowed_vx, blocker.right - rect.left)
+
+    moved_rect = rect.move(allowed_vx, 0)
+
+    for blocker in blockers:
+        # Only blockers in the same column as the moved rect can stop a vertical move
+        if blocker.right <= moved_rect.left or blocker.left >= moved_rect.right: continue
+
+        if   vy > 0 and blocker.top >= moved_rect.bottom: allowed_vy = min(allowed_vy, blocker.top - moved_rect.bottom)
+        elif vy < 0 and blocker.bottom <= moved_rect.top: allowed_vy = max(allowed_vy, blocker.bottom - moved_rect.top)
+
+    return allowed_vx, allowed_vy
+
+# Merges overlapping rects in to bigger ones, so the same area doesnt get redrawn twice
+def mergeRects(rects):
+    merged = []
+
+    for rect in rects:
+        rect = pygame.Rect(rect)
+
+        # Keep swallowing the merged rects that overlap the current one, until none of them do
+        while (index := rect.collidelist(merged)) != -1:
+            rect.union_ip(merged.pop(index))
 
-    if rotation != 0: image = pygame.transform.rotate(image, rotation)
+        merged.append(rect)
 
-    width, height = image.get_size()
+    return merged
 
-    return pygame.transform.scale(image, (width * scale, height * scale))
+class RenderLayer(pygame.Surface):
+    # A screen sized drawing layer that can record what gets drawn on to it instead of drawing it right away
+    # Used by the dirty rect rendering, which compares the recordings of two frames to find the parts of the screen that changed
+    # NOTE: Use drawRect() instead of pygame.draw.rect() on layers, so it gets recorded too
+
+    hashed_size_limit = 256 * 256 # Sources up to this many pixels also get their content hashed (so in place changes are noticed too)
+
+    def __init__(self, size, flags=0):
+        super().__init__(size, flags)
+
+        self.recording = False
+        self.commands = [] # (key, rect) of everything drawn this frame, where key describes the draw call
+        self.last_commands = [] # Same for the last frame
+
+    def blit(self, source, dest, area=None, special_flags=0):
+        if settings.debug_surface_formats: checkSurfaceFormat(source)
+        if Profiler.enabled: Profiler.count("layer blits")
+
+        if not self.recording: return super().blit(source, dest, area, special_flags)
+
+        area = None if area is None else pygame.Rect(area)
+        rect = pygame.Rect(dest[0], dest[1], *(source.get_size() if area is None else area.size))
+
+        # Surfaces that are small enough also get their content compared, because a lot of them get drawn on in place (outlines, healthbar...)
+        content_hash = None
+        if source.get_width() * source.get_height() <= RenderLayer.hashed_size_limit:
+            content_hash = hash(source.get_buffer().raw)
+
+        self.commands.append((("blit", source, rect.topleft, None if area is None else tuple(area), special_flags, source.get_alpha(), content_hash), rect.clip(self.get_rect())))
+
+        return rect.clip(self.get_rect())
+
+    def drawRect(self, color, rect, width=0):
+        if not self.recording: return pygame.draw.rect(self, color, rect, width)
+
+        rect = pygame.Rect(rect)
+        self.commands.append((("rect", tuple(color), tuple(rect), width), rect.clip(self.get_rect())))
+
+        return rect.clip(self.get_rect())
+
+    def startRecording(self):
+        self.last_commands = self.commands
+        self.commands = []
+        self.recording = True
+
+    def stopRecording(self):
+        self.recording = False
+
+    def changedRects(self):
+        # Rects of everything that was drawn last frame but not this frame and the other way around
+        last_keys = {key for key, rect in self.last_commands}
+        keys = {key for key, rect in self.commands}
+
+        return [rect for key, rect in self.last_commands if key not in keys] + [rect for key, rect in self.commands if key not in last_keys]
+
+    def replay(self, clip_rect):
+        # Actually draws the recorded commands, but only inside of clip_rect
+        self.set_clip(clip_rect)
+
+        for key, rect in self.commands:
+            if not rect.colliderect(clip_rect): continue
+
+            if key[0] == "blit":
+                super().blit(key[1], key[2], key[3], key[4])
+
+            elif key[0] == "rect":
+                pygame.draw.rect(self, key[1], key[2], key[3])
+
+        self.set_clip(None)
+
+class ChunkedSurface:
+    # Stand in for a huge surface (map_image, laser_surf of very big rooms), split in to fixed size chunks that only exist once they are needed
+    # Supports the parts of the Surface API the rooms use on them (blit, fill, set_clip, get_size...), use blitTo() to draw it
+    # render_chunk(surface, area_rect) draws the original content of a chunk, chunks that have it can be evicted and get rendered again when needed
+    # NOTE: Chunks that got blitted/filled on after being rendered are pinned, because render_chunk() cant bring those changes back
+
+    def __init__(self, size, flags=0, background=(0, 0, 0, 0), chunk_size=16 * 72, render_chunk=None):
+        self.size = tuple(size)
+        self.flags = flags
+        self.background = background # What the parts without a chunk look like
+        self.chunk_size = chunk_size
+        self.render_chunk = render_chunk
+
+        self.chunks = {} # (chunk x, chunk y) -> surface
+        self.pinned = set() # Chunks that cant be evicted
+        self.clip = None
+
+    def get_size(self):   return self.size
+    def get_width(self):  return self.size[0]
+    def get_height(self): return self.size[1]
+
+    def get_rect(self, **kwargs):
+        rect = pygame.Rect((0, 0), self.size)
+        for attribute, value in kwargs.items(): setattr(rect, attribute, value)
+
+        return rect
+
+    def set_clip(self, rect): self.clip = None if rect is None else pygame.Rect(rect)
+    def get_clip(self): return pygame.Rect(self.clip) if self.clip is not None else self.get_rect()
+
+    def chunkRect(self, key):
+        return pygame.Rect(key[0] * self.chunk_size, key[1] * self.chunk_size, self.chunk_size, self.chunk_size).clip(self.get_rect())
+
+    def chunkKeys(self, rect):
+        # Keys of all of the chunks the rect overlaps
+        rect = pygame.Rect(rect).clip(self.get_rect())
+        if not rect.width or not rect.height: return []
+
+        return [(x, y) for y in range(rect.top // self.chunk_size, (rect.bottom - 1) // self.chunk_size + 1)
+                       for x in range(rect.left // self.chunk_size, (rect.right - 1) // self.chunk_size + 1)]
+
+    def chunk(self, key):
+        # Returns the chunk, creating (and rendering) it first if it doesnt exist
+        if key not in self.chunks:
+            chunk_rect = self.chunkRect(key)
+
+            chunk = pygame.Surface(chunk_rect.size, self.flags)
+            chunk.fill(self.background)
+            if self.render_chunk is not None: self.render_chunk(chunk, chunk_rect)
+
+            self.chunks[key] = chunk
+
+        return self.chunks[key]
+
+    def blit(self, source, dest, area=None, special_flags=0):
+        area = None if area is None else pygame.Rect(area)
+        rect = pygame.Rect(int(dest[0]), int(dest[1]), *(source.get_size() if area is None else area.size))
+
+        drawn_rect = rect.clip(self.get_clip())
+
+        for key in self.chunkKeys(drawn_rect):
+            chunk_rect = self.chunkRect(key)
+            chunk = self.chunk(key)
+
+            chunk.set_clip(drawn_rect.clip(chunk_rect).move(-chunk_rect.x, -chunk_rect.y))
+            chunk.blit(source, (rect.x - chunk_rect.x, rect.y - chunk_rect.y), area, special_flags)
+            chunk.set_clip(None)
+
+            self.pinned.add(key)
+
+        return drawn_rect
+
+    def fill(self, color, rect=None):
+        rect = self.get_rect() if rect is None else pygame.Rect(rect)
+        filled_rect = rect.clip(self.get_clip())
+
+        for key in self.chunkKeys(filled_rect):
+            # Filling a chunk that doesnt exist yet with the background doesnt change anything
+            if key not in self.chunks and self.render_chunk is None and pygame.Color(color) == pygame.Color(self.background): continue
+
+            chunk_rect = self.chunkRect(key)
+            self.chunk(key).fill(color, filled_rect.clip(chunk_rect).move(-chunk_rect.x, -chunk_rect.y))
+
+            self.pinned.add(key)
+
+        return filled_rect
+
+    def blitTo(self, target, dest, area=None):
+        # Same as target.blit(self, dest, area) for a normal surface
+        area = self.get_rect() if area is None else pygame.Rect(area)
+
+        for key in self.chunkKeys(area):
+            # Transparent chunks that were never drawn on wouldnt change anything
+            if key not in self.chunks and self.render_chunk is None and self.flags & pygame.SRCALPHA: continue
+
+            chunk_rect = self.chunkRect(key)
+            visible_part = area.clip(chunk_rect)
+
+            target.blit(self.chunk(key), (dest[0] + visible_part.x - area.x, dest[1] + visible_part.y - area.y), visible_part.move(-chunk_rect.x, -chunk_rect.y))
+
+    def evictChunks(self, keep_rect):
+        # Drops the chunks outside of keep_rect that can be rendered again
+        if self.render_chunk is None: return
+
+        keep = set(self.chunkKeys(keep_rect))
+
+        for key in [key for key in self.chunks if key not in keep and key not in self.pinned]:
+            del self.chunks[key]
 
 class Gif:
     def __init__(self, gif_path, pos, speed=5, loops=1, callback=None):
@@ -66,11 +511,8 @@ class Gif:
         self.current_frame_idx = 0
         self.frame_timer = 0
 
-    def draw(self, surface, custom_updated_pos=None):
-        # custom_updated_pos is only used when the gif changes position elsewhere (mostly engine.camera.apply)
-
-        surface.blit(self.frames[self.current_frame_idx], custom_updated_pos if custom_updated_pos != None else self.rect.topleft)
-
+    def update(self):
+        # Advances the frames once per update, so the gif plays at the same speed no matter the frame rate
         if not self.active: return
 
         self.frame_timer += 1
@@ -99,6 +541,11 @@ class Gif:
             if self.callback != None:
                 self.callback()
 
+    def draw(self, surface, custom_updated_pos=None):
+        # custom_updated_pos is only used when the gif changes position elsewhere (mostly engine.camera.apply)
+
+        surface.blit(self.frames[self.current_frame_idx], custom_updated_pos if custom_updated_pos != None else self.rect.topleft)
+
 class SmallFont:
     # NOTE: These variables are at class level, so all SmallFont instances have the same ones
 
@@ -111,16 +558,18 @@ class SmallFont:
     GLYPH_HEIGHT = 20
     LINE_HEIGHT = 28
 
-    def __init__(self, color):
+    cache_size = 128 # How many rendered strings each font keeps around
+
+    def __init__(self, color, prerender_numbers=False):
         stencil = loadScaledAsset("assets/fonts/small_font.png").convert()
         stencil.set_colorkey((255, 255, 255)) # Make the white color transparent
 
-        self.image = pygame.Surface(stencil.get_size(), pygame.SRCALPHA)
+        self.image = pygame.Surface(stencil.get_size()).convert() # Opaque, the transparency comes from the colorkey
         self.image.fill(color)
         self.image.blit(stencil, (0, 0)) # Blit the source with the old color colorkeyed off, which leaves glyph pixels
-        self.image.set_colorkey((0, 0, 0)) # Make the color of the stencil (black) transparent
+        self.image.set_colorkey((0, 0, 0), pygame.RLEACCEL) # Make the color of the stencil (black) transparent, RLE makes skipping it cheap
 
-        # Dictionary with keys as characters and values as subsurfaces of the scaled up font image
+        # Dictionary with keys as characters and values as glyph images cut out of the scaled up font image
         self.glyphs = {}
 
         # Extract number glyphs
@@ -134,7 +583,36 @@ class SmallFont:
                 case 'W': self.glyphs[ch] = self.image.subsurface((392,    0,  SmallFont.WIDE_WIDTH,     SmallFont.GLYPH_HEIGHT))
                 case _:   self.glyphs[ch] = self.image.subsurface((i * 16, 20, SmallFont.STANDARD_WIDTH, SmallFont.GLYPH_HEIGHT))
 
+        # Subsurfaces dont keep the RLE acceleration, so every glyph gets its own RLE encoded copy
+        for ch, glyph in self.glyphs.items():
+            self.glyphs[ch] = glyph.copy()
+            self.glyphs[ch].set_colorkey((0, 0, 0), pygame.RLEACCEL)
+
+        # Rendered strings, the least recently used ones get dropped first
+        self.cache = OrderedDict()
+
+        # Numbers 0-99 that never get dropped (for fonts that draw counts every frame, like the inventory's)
+        self.numbers = {str(number): self.renderText(str(number)) for number in range(100)} if prerender_numbers else {}
+
     def render(self, text):
+        # NOTE: The returned surface is shared with every other render() of the same text, so it has to be copied before drawing on it
+        render_surf = self.numbers.get(text)
+        if render_surf is not None: return render_surf
+
+        render_surf = self.cache.get(text)
+
+        if render_surf is not None:
+            self.cache.move_to_end(text)
+            return render_surf
+
+        render_surf = self.cache[text] = self.renderText(text)
+
+        if len(self.cache) > SmallFont.cache_size: self.cache.popitem(last=False)
+
+        return render_surf
+
+    def renderText(self, text):
+        # Always renders a new surface
         # Calculate height
         surf_height = (text.count("\n") + 1) * self.LINE_HEIGHT
 
@@ -487,8 +965,9 @@ class Typer:
         self.callback = None
 
         # Variables for caching
-        self.rendered_lines = []
+        self.rendered_lines = [] # Surfaces of the completed lines
         self.current_line_text = ""
+        self.current_line_surf = None
 
     def startTyping(self, text, pos, callback, char_delay=10):
         self.active = True
@@ -508,6 +987,7 @@ class Typer:
         # Reset cache
         self.rendered_lines = []
         self.current_line_text = ""
+        self.current_line_surf = None
 
     def update(self):
         self.char_timer += 1
@@ -522,7 +1002,7 @@ class Typer:
             # Check if the current line is finished
             if self.char_idx > len(current_line):
                 # Store the completed line (no need to re-render it)
-                self.rendered_lines.append(current_line)
+                self.rendered_lines.append(self.font.renderText(current_line))
 
                 self.char_idx = 0
                 self.row_idx += 1
@@ -542,25 +1022,27 @@ class Typer:
 
                     self.rendered_lines = []
                     self.current_line_text = ""
+                    self.current_line_surf = None
 
                     if self.callback:
                         self.callback()
 
             else:
-                # Update current line text for rendering
+                # Update current line text for rendering (only rendered when it changes, every partial line is different so it skips the font's cache)
                 self.current_line_text = current_line[:self.char_idx]
+                self.current_line_surf = self.font.renderText(self.current_line_text)
 
     def draw(self, layer_1):
         # Draw all completed lines
         y_offset = self.pos[1] - SmallFont.LINE_HEIGHT  # Start one line higher
 
-        for line_text in self.rendered_lines:
-            layer_1.blit(self.font.render(line_text), (self.pos[0], y_offset))
+        for line_surf in self.rendered_lines:
+            layer_1.blit(line_surf, (self.pos[0], y_offset))
             y_offset += SmallFont.LINE_HEIGHT
 
         # Draw the current line being typed
         if self.current_line_text:
-            layer_1.blit(self.font.render(self.current_line_text), (self.pos[0], y_offset))
+            layer_1.blit(self.current_line_surf, (self.pos[0], y_offset))
 
 class ListEntry:
     def __init__(self, listbox, name, bg_color=(20, 20, 20), secondary_text=""):